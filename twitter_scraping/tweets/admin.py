@@ -1,6 +1,9 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
-from .models import Tweet, TwitterUser, ScrapingRequest
+from .models import Tweet, TwitterUser, ScrapingRequest, ScrapingRequestEvent
 from .utils import export
 
 
@@ -100,6 +103,11 @@ class TweetAdmin(admin.ModelAdmin):
         "quoted_tweet",
         "scraping_request",
     )
+    list_select_related = (
+        "user",
+        "in_reply_to_tweet__user",
+        "conversation_tweet__user",
+    )
     actions = ["export_tweets"]
 
     def show_tweet_url(self, obj):
@@ -143,11 +151,23 @@ class TwitterUserAdmin(admin.ModelAdmin):
     list_display = ("id", "twitter_id", "username", "display_name", "location")
 
 
+class ScrapingRequestEventInline(admin.TabularInline):
+    model = ScrapingRequestEvent
+    fields = ("created", "name", "count", "message")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(ScrapingRequest)
 class ScrapingRequestAdmin(admin.ModelAdmin):
     list_display = (
         "id",
         "status",
+        "priority",
         "include_replies",
         "show_username_url",
         "show_tweet_url",
@@ -169,6 +189,28 @@ class ScrapingRequestAdmin(admin.ModelAdmin):
         "export_scraping_results",
         "create_conversation_scraping_requests",
     ]
+    inlines = [ScrapingRequestEventInline]
+
+    def get_queryset(self, request):
+        # The legacy logs can be huge, and are only loaded by the change form
+        queryset = super().get_queryset(request).defer("logs")
+        # Columns of the changelist computed in the same query, instead of one per row
+        tweets_saved = (
+            Tweet.objects.filter(scraping_request=OuterRef("pk"))
+            .order_by()
+            .values("scraping_request")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        tweet_username = Tweet.objects.filter(twitter_id=OuterRef("twitter_id")).values(
+            "user__username"
+        )[:1]
+        return queryset.annotate(
+            tweets_saved_count=Coalesce(
+                Subquery(tweets_saved, output_field=IntegerField()), 0
+            ),
+            tweet_username=Subquery(tweet_username),
+        )
 
     def show_username_url(self, obj):
         return format_html(f"<a href='{obj.get_twitter_url()}'>{obj.username}</a>")
@@ -176,28 +218,25 @@ class ScrapingRequestAdmin(admin.ModelAdmin):
     show_username_url.short_description = "Username"
 
     def show_tweet_url(self, obj):
-        try:
-            tweet = Tweet.objects.get(twitter_id=obj.twitter_id)
-            return format_html(
-                f"<a href='{tweet.get_twitter_url()}'>{tweet.twitter_id}</a>"
-            )
-        except:
+        if not obj.tweet_username:
             return obj.twitter_id
+        url = f"https://twitter.com/{obj.tweet_username}/status/{obj.twitter_id}"
+        return format_html(f"<a href='{url}'>{obj.twitter_id}</a>")
 
     show_tweet_url.short_description = "Tweet Id"
 
     def tweets_saved(self, obj):
-        try:
-            # To Do: Include tweets from derived requests (might require a new fk field)
-            return Tweet.objects.filter(scraping_request=obj).count()
-        except Exception as e:
-            return None
+        # To Do: Include tweets from derived requests (might require a new fk field)
+        return obj.tweets_saved_count
 
     tweets_saved.short_description = "Tweets saved"
 
     def start_scraping(self, request, queryset):
         for obj in queryset:
-            obj.create_scraping_task()
+            try:
+                obj.create_scraping_task()
+            except ValidationError as e:
+                self.message_user(request, " ".join(e.messages), messages.ERROR)
 
     start_scraping.short_description = "Start scraping tasks"
 
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TweetsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tweets"
+
+    def ready(self):
+        # Connects the signal hooks of the metrics and the query counts
+        from . import metrics, querycount  # noqa: F401
@@ -0,0 +1,180 @@
+"""Ingestion throughput benchmarks, run by the benchmark_ingestion command.
+
+Synthetic tweets are built from the shapes of the tweets in tweets.tweet_samples: root
+tweets, replies, replies to replies, quotes, quoted tombstones and retweets, with unique
+ids, a fixed set of users and reply chains pointing to tweets of the same batch. They are
+pushed through record_tweet, scrape_user_tweets and scrape_tweet_replies, with the
+scrapers replaced by the synthetic tweets.
+"""
+
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from django.db import connection
+from unittest.mock import patch
+import json
+import resource
+import time
+
+from .models import ScrapingRequest, Tweet, TwitterUser
+from .querycount import QueryCounter
+from .serializers import TwitterUserCache
+from .tasks import record_tweet, scrape_tweet_replies, scrape_user_tweets
+from .tweet_samples import (
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tombstone,
+    tweet_with_quoted_tweet,
+    tweet_with_retweet,
+)
+
+# Shapes of a thread: a root tweet, a reply to it and a reply to the reply, followed by
+# root tweets quoting a tweet, quoting a deleted tweet and retweeting a tweet
+SHAPES = [
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_quoted_tombstone,
+    tweet_with_retweet,
+]
+FIRST_TWEET_ID = 10**18
+FIRST_USER_ID = 10**12
+NEWEST_DATE = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_user(shape, number):
+    return replace(
+        shape.user, id=FIRST_USER_ID + number, username=f"synthetic_user_{number}"
+    )
+
+
+def synthetic_tweets(count, users=50):
+    """Yields count snscrape tweets, from the newest to the oldest"""
+    for i in range(count):
+        shape = SHAPES[i % len(SHAPES)]
+        tweet_id = FIRST_TWEET_ID + i
+        fields = {
+            "id": tweet_id,
+            "url": f"https://twitter.com/synthetic/status/{tweet_id}",
+            "date": NEWEST_DATE - timedelta(minutes=i),
+            "user": synthetic_user(shape, i % users),
+            "conversationId": tweet_id,
+        }
+        if shape.inReplyToTweetId:
+            fields["inReplyToTweetId"] = tweet_id - 1
+            fields["conversationId"] = tweet_id - i % len(SHAPES)
+        # Related tweets get ids after the ones of the main tweets
+        related_id = FIRST_TWEET_ID + count + i
+        if shape.quotedTweet:
+            fields["quotedTweet"] = replace(shape.quotedTweet, id=related_id)
+        if shape.retweetedTweet:
+            fields["retweetedTweet"] = replace(
+                shape.retweetedTweet,
+                id=related_id,
+                conversationId=related_id,
+                user=synthetic_user(shape.retweetedTweet, (i + 1) % users),
+            )
+        yield replace(shape, **fields)
+
+
+def reset_database():
+    tables = [model._meta.db_table for model in [Tweet, TwitterUser, ScrapingRequest]]
+    with connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+
+
+def ingest_with_record_tweet(tweets):
+    req = ScrapingRequest.objects.create(username="synthetic_user_0")
+    user_cache = TwitterUserCache()
+    for tweet in tweets:
+        record_tweet(tweet, req.id, user_cache=user_cache)
+
+
+def ingest_with_scrape_user_tweets(tweets):
+    req = ScrapingRequest.objects.create(
+        username="synthetic_user_0",
+        include_replies=False,
+        since=datetime(2000, 1, 1, tzinfo=timezone.utc),
+    )
+    with patch(
+        "snscrape.modules.twitter.TwitterProfileScraper.get_items",
+        return_value=iter(tweets),
+    ):
+        scrape_user_tweets(req.id)
+
+
+def ingest_with_scrape_tweet_replies(tweets):
+    req = ScrapingRequest.objects.create(
+        username="synthetic_user_0", twitter_id=str(FIRST_TWEET_ID)
+    )
+    with patch(
+        "snscrape.modules.twitter.TwitterTweetScraper.get_items",
+        return_value=iter(tweets),
+    ):
+        scrape_tweet_replies(FIRST_TWEET_ID, req.id)
+
+
+BENCHMARKS = {
+    "record_tweet": ingest_with_record_tweet,
+    "scrape_user_tweets": ingest_with_scrape_user_tweets,
+    "scrape_tweet_replies": ingest_with_scrape_tweet_replies,
+}
+
+
+def run_benchmark(name, size):
+    """Ingests size synthetic tweets into an empty database and returns the measurements.
+    peak_rss_mb is the peak of the whole process so far, so sizes should go up.
+    """
+    reset_database()
+    tweets = list(synthetic_tweets(size))
+    with patch("tweets.tasks.start_next_scraping_request.delay"):
+        with QueryCounter() as counter:
+            started_at = time.perf_counter()
+            BENCHMARKS[name](tweets)
+            elapsed = time.perf_counter() - started_at
+
+    stored = Tweet.objects.filter(twitter_id__lt=str(FIRST_TWEET_ID + size)).count()
+    if stored != size:
+        raise RuntimeError(f"{name} stored {stored} of {size} tweets")
+    return {
+        "tweets_per_sec": size / elapsed,
+        "queries_per_tweet": counter.count / size,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """Compares results to a baseline, both keyed by "<benchmark>:<size>", and returns
+    the measurements worse than the baseline by more than tolerance
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]
+        if result["tweets_per_sec"] < expected["tweets_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {result['tweets_per_sec']:.0f} tweets/s, baseline {expected['tweets_per_sec']:.0f}"
+            )
+        if result["queries_per_tweet"] > expected["queries_per_tweet"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{key}: {result['queries_per_tweet']:.2f} queries/tweet, baseline {expected['queries_per_tweet']:.2f}"
+            )
+        if result["peak_rss_mb"] > expected["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: peak RSS {result['peak_rss_mb']:.0f} MB, baseline {expected['peak_rss_mb']:.0f}"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,130 @@
+"""Records the items returned by snscrape scrapers to cassettes and replays them offline.
+
+A cassette is a gzipped JSON lines file with one scraped item per line, along with the
+seconds elapsed since the scraping started. Items are encoded losslessly: snscrape
+dataclasses, datetimes, enums, tuples and counts with granularity are tagged with their
+type, so replayed items are equal to the recorded ones. Replays wait between items as long
+as the recording did, divided by the replay speed, or not at all with a speed of 0.
+
+With SCRAPER_CASSETTE_MODE set to "record" or "replay", get_items() records or replays the
+scrapings made by the tasks, from the cassettes in SCRAPER_CASSETTE_PATH.
+"""
+
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from django.conf import settings
+from django.utils.text import slugify
+from enum import Enum
+from pathlib import Path
+import gzip
+import json
+import snscrape.base
+import snscrape.modules.twitter
+import time
+
+
+def encode(value):
+    """Encodes a scraped item, or any of its attributes, as JSON serializable values"""
+    if is_dataclass(value):
+        return {
+            "_type": type(value).__name__,
+            **{
+                field.name: encode(getattr(value, field.name))
+                for field in fields(value)
+            },
+        }
+    if isinstance(value, datetime):
+        return {"_type": "datetime", "value": value.isoformat()}
+    if isinstance(value, Enum):
+        return {"_type": type(value).__name__, "value": value.value}
+    if isinstance(value, snscrape.base.IntWithGranularity):
+        return {
+            "_type": "IntWithGranularity",
+            "value": int(value),
+            "granularity": value.granularity,
+        }
+    if isinstance(value, tuple):
+        return {"_type": "tuple", "items": [encode(item) for item in value]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {"_type": "dict", "items": {k: encode(v) for k, v in value.items()}}
+    return value
+
+
+def decode(value):
+    """Rebuilds the values encoded by encode()"""
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    type_name = value["_type"]
+    if type_name == "datetime":
+        return datetime.fromisoformat(value["value"])
+    if type_name == "IntWithGranularity":
+        return snscrape.base.IntWithGranularity(value["value"], value["granularity"])
+    if type_name == "tuple":
+        return tuple(decode(item) for item in value["items"])
+    if type_name == "dict":
+        return {k: decode(v) for k, v in value["items"].items()}
+
+    cls = getattr(snscrape.modules.twitter, type_name)
+    if issubclass(cls, Enum):
+        return cls(value["value"])
+    return cls(**{k: decode(v) for k, v in value.items() if k != "_type"})
+
+
+def record(items, path):
+    """Yields the items of a scraper while writing them to the cassette at path. The cassette
+    is complete once the generator is exhausted or closed.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    started_at = time.monotonic()
+    with gzip.open(path, "wt", encoding="utf-8") as cassette:
+        for item in items:
+            line = {"t": time.monotonic() - started_at, "item": encode(item)}
+            cassette.write(json.dumps(line, ensure_ascii=False) + "\n")
+            yield item
+
+
+def replay(path, speed=1):
+    """Yields the items recorded in the cassette at path, as fast as they were scraped
+    times speed. A speed of 0 yields them without waiting.
+    """
+    started_at = time.monotonic()
+    with gzip.open(path, "rt", encoding="utf-8") as cassette:
+        for line in cassette:
+            line = json.loads(line)
+            if speed:
+                wait = line["t"] / speed - (time.monotonic() - started_at)
+                if wait > 0:
+                    time.sleep(wait)
+            yield decode(line["item"])
+
+
+def cassette_name(scraper):
+    """Names the cassette of a scraper after its class and the arguments identifying it"""
+    parts = [type(scraper).__name__]
+    for attr in ["_user", "_tweetId", "_query", "_mode"]:
+        value = getattr(scraper, attr, None)
+        if isinstance(value, Enum):
+            value = value.name
+        if value is not None:
+            parts.append(str(value))
+    return slugify("-".join(parts)) + ".jsonl.gz"
+
+
+def get_items(scraper, mode=None, speed=None):
+    """Returns the items of a scraper, recorded or replayed according to the
+    SCRAPER_CASSETTE_MODE setting, or the mode argument
+    """
+    mode = mode if mode is not None else settings.SCRAPER_CASSETTE_MODE
+    speed = speed if speed is not None else settings.SCRAPER_REPLAY_SPEED
+    path = Path(settings.SCRAPER_CASSETTE_PATH) / cassette_name(scraper)
+    if mode == "record":
+        return record(scraper.get_items(), path)
+    if mode == "replay":
+        return replay(path, speed)
+    return scraper.get_items()
@@ -0,0 +1,314 @@
+"""Synthetic corpus of tweets for scale testing, generated by the generate_corpus command.
+
+Conversations are started by the TOTAL_POLITICIANS accounts and grow into reply trees:
+the root tweet gets on average `fanout` replies, scaled by the popularity of its author,
+and every reply gets on average `branching` replies, down to `max_depth` levels. Besides
+the conversations, politicians retweet and quote earlier tweets, making up `retweet_ratio`
+and `quote_ratio` of the rows. Popularity follows a Zipf law with exponent `skew`, both
+for the politicians starting conversations and for the users replying to them.
+
+Rows are streamed into the database with COPY, one transaction per batch, and get their
+primary keys and links to other tweets up front, so they don't need to be resolved later.
+Only a conversation is kept in memory at a time.
+"""
+
+from collections import deque
+from datetime import datetime, timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+import io
+import itertools
+import math
+import random
+
+from .models import RELATED_TWEET_FIELDS, Tweet, TwitterUser
+from .values import SCRAPING_PERIODS, TOTAL_POLITICIANS
+
+# Length of the content column, which the generated text can't exceed or COPY fails
+CONTENT_MAX_LENGTH = Tweet._meta.get_field("content").max_length
+
+# Offset of the twitter ids of the corpus, past the ones of real tweets and users
+CORPUS_ID_OFFSET = 9 * 10**18
+
+WORDS = [
+    "eleição",
+    "governo",
+    "deputado",
+    "senado",
+    "proposta",
+    "votação",
+    "saúde",
+    "educação",
+    "segurança",
+    "economia",
+    "povo",
+    "Brasil",
+    "hoje",
+    "obrigado",
+    "absurdo",
+    "parabéns",
+    "#eleicoes2022",
+    "#fato",
+]
+
+
+class RowStream(io.TextIOBase):
+    """File-like object reading the lines of a generator, for cursor.copy_expert"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return (
+            value.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+    return str(value)
+
+
+def copy_rows(model, rows, batch_size):
+    """Copies rows, dicts keyed by column, into the table of model in batches.
+    Columns missing from a row are copied as NULL.
+    """
+    table = model._meta.db_table
+    columns = [field.column for field in model._meta.concrete_fields]
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    rows = iter(rows)
+    copied = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        lines = (
+            "\t".join(copy_value(row.get(column)) for column in columns) + "\n"
+            for row in batch
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.copy_expert(sql, RowStream(lines))
+        copied += len(batch)
+    return copied
+
+
+def next_ids(model, count):
+    """Reserves count primary keys of model and returns the first one"""
+    table = model._meta.db_table
+    sequence = f"pg_get_serial_sequence('{table}', 'id')"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval({sequence}, GREATEST("
+            + f"(SELECT MAX(id) FROM {table}), nextval({sequence})) + %s)",
+            [count],
+        )
+        last_id = cursor.fetchone()[0]
+    return last_id - count + 1
+
+
+def zipf_weights(count, skew):
+    """Cumulative Zipf weights of count items, for random.choices"""
+    return list(itertools.accumulate(1 / rank**skew for rank in range(1, count + 1)))
+
+
+def user_rows(first_id, usernames, now, rng):
+    for i, username in enumerate(usernames):
+        user_id = first_id + i
+        yield {
+            "id": user_id,
+            "created": now,
+            "modified": now,
+            "twitter_id": str(CORPUS_ID_OFFSET + user_id),
+            "username": username,
+            "display_name": username,
+            "description": "",
+            "account_created_at": now - timedelta(days=rng.randrange(365 * 15)),
+            "location": "",
+            "followers_count": rng.randrange(100000),
+            "following_count": rng.randrange(5000),
+            "tweet_count": rng.randrange(50000),
+            "listed_count": rng.randrange(100),
+        }
+
+
+def content(rng):
+    text = " ".join(rng.choices(WORDS, k=rng.randint(3, 30)))
+    if len(text) > CONTENT_MAX_LENGTH:
+        # Drop the word cut in half by the limit
+        text = text[: CONTENT_MAX_LENGTH + 1].rsplit(" ", 1)[0]
+    return text
+
+
+def long_tail(rng, mean):
+    """A count with the given mean and a long tail, like the replies or likes of tweets.
+    It follows a geometric distribution, drawn by flooring an exponential one.
+    """
+    return int(rng.expovariate(math.log(1 + 1 / mean))) if mean > 0 else 0
+
+
+def tweet_rows(
+    count,
+    first_id,
+    politician_ids,
+    commenter_ids,
+    fanout,
+    branching,
+    max_depth,
+    max_conversation_size,
+    skew,
+    retweet_ratio,
+    quote_ratio,
+    now,
+    rng,
+):
+    """Yields count tweet rows, with ids from first_id on, as conversations, retweets and
+    quotes of the politicians
+    """
+    politician_weights = zipf_weights(len(politician_ids), skew)
+    commenter_weights = zipf_weights(len(commenter_ids), skew)
+    # Mean weight of a politician, so the most popular ones get more replies than fanout
+    mean_weight = politician_weights[-1] / len(politician_ids)
+    since = min(period["since"] for period in SCRAPING_PERIODS)
+    until = max(period["until"] for period in SCRAPING_PERIODS)
+    since = timezone.make_aware(datetime.strptime(since, "%Y-%m-%d"))
+    until = timezone.make_aware(datetime.strptime(until, "%Y-%m-%d"))
+    period_seconds = int((until - since).total_seconds())
+
+    def twitter_id(tweet_id):
+        return str(CORPUS_ID_OFFSET + tweet_id)
+
+    def row(tweet_id, user_id, published_at, **links):
+        row = {
+            "id": tweet_id,
+            "created": now,
+            "modified": now,
+            "twitter_id": twitter_id(tweet_id),
+            "content": content(rng),
+            "published_at": published_at,
+            "user_id": user_id,
+            "reply_count": 0,
+            "retweet_count": long_tail(rng, 5),
+            "like_count": long_tail(rng, 50),
+            "quote_count": long_tail(rng, 1),
+            "view_count": long_tail(rng, 1000),
+        }
+        for fk_field, target_id in links.items():
+            row[f"{fk_field}_id"] = target_id
+            row[RELATED_TWEET_FIELDS[fk_field]] = twitter_id(target_id)
+        return row
+
+    next_id = first_id
+    last_id = first_id + count
+    retweets = quotes = 0
+    while next_id < last_id:
+        published_at = since + timedelta(seconds=rng.randrange(period_seconds))
+        (author_index,) = rng.choices(
+            range(len(politician_ids)), cum_weights=politician_weights
+        )
+        author_id = politician_ids[author_index]
+        # Retweets and quotes of earlier tweets are added as they fall behind their ratio
+        copied = next_id - first_id
+        fk_field = None
+        if retweets < retweet_ratio * copied:
+            fk_field = "retweeted_tweet"
+            retweets += 1
+        elif quotes < quote_ratio * copied:
+            fk_field = "quoted_tweet"
+            quotes += 1
+        if fk_field:
+            target_id = rng.randrange(first_id, next_id)
+            yield row(next_id, author_id, published_at, **{fk_field: target_id})
+            next_id += 1
+            continue
+
+        # A conversation, generated breadth first and yielded once its reply counts are known
+        weight = politician_weights[author_index] - (
+            politician_weights[author_index - 1] if author_index else 0
+        )
+        limit = min(max_conversation_size, last_id - next_id)
+        root = row(next_id, author_id, published_at, conversation_tweet=next_id)
+        conversation = [root]
+        frontier = deque([(root, 0, fanout * weight / mean_weight)])
+        while frontier and len(conversation) < limit:
+            parent, depth, mean = frontier.popleft()
+            if depth >= max_depth:
+                continue
+            for _ in range(long_tail(rng, mean)):
+                if len(conversation) >= limit:
+                    break
+                reply_id = next_id + len(conversation)
+                reply = row(
+                    reply_id,
+                    rng.choices(commenter_ids, cum_weights=commenter_weights)[0],
+                    parent["published_at"] + timedelta(seconds=rng.randrange(1, 3600)),
+                    in_reply_to_tweet=parent["id"],
+                    conversation_tweet=next_id,
+                )
+                parent["reply_count"] += 1
+                conversation.append(reply)
+                frontier.append((reply, depth + 1, branching))
+        yield from conversation
+        next_id += len(conversation)
+
+
+def generate_corpus(
+    tweets,
+    users=100000,
+    fanout=50,
+    branching=0.9,
+    max_depth=50,
+    max_conversation_size=20000,
+    skew=1.1,
+    retweet_ratio=0.1,
+    quote_ratio=0.05,
+    batch_size=100000,
+    seed=None,
+):
+    """Copies users and tweets of a synthetic corpus into the database and returns the
+    number of rows copied of each
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    usernames = list(TOTAL_POLITICIANS) + [f"corpus_user_{i}" for i in range(users)]
+    first_user_id = next_ids(TwitterUser, len(usernames))
+    user_ids = range(first_user_id, first_user_id + len(usernames))
+    copied_users = copy_rows(
+        TwitterUser, user_rows(first_user_id, usernames, now, rng), batch_size
+    )
+
+    first_tweet_id = next_ids(Tweet, tweets)
+    rows = tweet_rows(
+        tweets,
+        first_tweet_id,
+        user_ids[: len(TOTAL_POLITICIANS)],
+        user_ids[len(TOTAL_POLITICIANS) :],
+        fanout,
+        branching,
+        max_depth,
+        max_conversation_size,
+        skew,
+        retweet_ratio,
+        quote_ratio,
+        now,
+        rng,
+    )
+    copied_tweets = copy_rows(Tweet, rows, batch_size)
+    return {"users": copied_users, "tweets": copied_tweets}
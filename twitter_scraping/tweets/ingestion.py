@@ -0,0 +1,346 @@
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import connections, transaction
+from rest_framework.serializers import ValidationError
+from snscrape.modules.twitter import Tweet as SNTweet, Tombstone
+import queue
+import threading
+
+from .mappers import map_tweet
+from .metrics import TWEETS_INGESTED
+from .models import Tweet, TwitterUser
+from .serializers import TwitterUserCache
+from .timings import StageTimings
+from .utils import tweet_to_json
+
+logger = get_task_logger(__name__)
+
+USER_UPDATE_FIELDS = [
+    "username",
+    "display_name",
+    "description",
+    "account_created_at",
+    "location",
+    "followers_count",
+    "following_count",
+    "tweet_count",
+    "listed_count",
+    "modified",
+]
+
+TWEET_UPDATE_FIELDS = [
+    "content",
+    "published_at",
+    "in_reply_to_id",
+    "conversation_id",
+    "retweeted_id",
+    "quoted_id",
+    "user",
+    "reply_count",
+    "retweet_count",
+    "like_count",
+    "quote_count",
+    "view_count",
+    "raw_tweet_object",
+    "modified",
+]
+
+
+def validate_tweet(raw_tweet):
+    """Validates a snscrape.Tweet and returns its model fields, without touching the database"""
+    data = map_tweet(raw_tweet)
+    for attr, field in [
+        ("quotedTweet", "quoted_id"),
+        ("retweetedTweet", "retweeted_id"),
+    ]:
+        related = getattr(raw_tweet, attr)
+        if type(related) in [SNTweet, Tombstone]:
+            data[field] = str(related.id)
+    data["raw_tweet_object"] = tweet_to_json(raw_tweet)
+    return data
+
+
+class TweetBatchWriter:
+    """Buffers scraped tweets and upserts them in bulk, users first and then tweets
+
+    Quoted and retweeted tweets are written along with the tweet that references them,
+    but are not attributed to the scraping request nor counted as created or updated.
+    on_flush, if given, is called after each written batch with the created and updated
+    twitter ids and the last twitter id of the batch. The time spent validating and writing
+    is added to timings, a StageTimings.
+    """
+
+    def __init__(
+        self, req_id=None, batch_size=None, user_cache=None, on_flush=None, timings=None
+    ):
+        self.req_id = req_id
+        self.on_flush = on_flush
+        self.timings = timings if timings is not None else StageTimings()
+        self.batch_size = batch_size or settings.SCRAPING_BATCH_SIZE
+        self.user_cache = user_cache if user_cache is not None else TwitterUserCache()
+        self.tweets = {}
+        self.related_tweets = {}
+        self.created_ids = []
+        self.updated_ids = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.flush()
+
+    def __len__(self):
+        return len(self.tweets)
+
+    def add(self, raw_tweet):
+        """Validates and buffers a tweet, flushing the buffer once it is full.
+        Raises ValidationError for invalid tweets, which are left out of the batch.
+        """
+        with self.timings.measure("serialize"):
+            data = validate_tweet(raw_tweet)
+            for related in [raw_tweet.quotedTweet, raw_tweet.retweetedTweet]:
+                if type(related) == SNTweet:
+                    try:
+                        self.related_tweets[str(related.id)] = validate_tweet(related)
+                    except ValidationError as e:
+                        logger.error(
+                            f"req_id={self.req_id}: Erro de validação ao salvar tweet {related}: {e}"
+                        )
+
+        # Later versions of the same tweet replace earlier ones in the batch
+        self.tweets.pop(data["twitter_id"], None)
+        self.tweets[data["twitter_id"]] = data
+        if len(self.tweets) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.tweets and not self.related_tweets:
+            return [], []
+
+        tweets, self.tweets = self.tweets, {}
+        related_tweets, self.related_tweets = self.related_tweets, {}
+        for twitter_id in tweets:
+            related_tweets.pop(twitter_id, None)
+
+        try:
+            with transaction.atomic():
+                created_ids, updated_ids = self._write(tweets, related_tweets)
+        except Exception as e:
+            logger.error(
+                f"req_id={self.req_id}: Exceção ao gravar lote de {len(tweets)} tweets, gravando individualmente: {e}"
+            )
+            # Users written inside the rolled back transaction can't be trusted anymore
+            self.user_cache.discard(
+                data["user"]["twitter_id"]
+                for data in [*related_tweets.values(), *tweets.values()]
+            )
+            with self.timings.measure("tweet_upsert"):
+                created_ids, updated_ids = self._write_one_by_one(
+                    tweets, related_tweets
+                )
+
+        self.created_ids.extend(created_ids)
+        self.updated_ids.extend(updated_ids)
+        TWEETS_INGESTED.labels("created").inc(len(created_ids))
+        TWEETS_INGESTED.labels("updated").inc(len(updated_ids))
+        if self.on_flush and tweets:
+            with self.timings.measure("log_writes"):
+                self.on_flush(created_ids, updated_ids, list(tweets)[-1])
+        return created_ids, updated_ids
+
+    def _write(self, tweets, related_tweets):
+        users = {}
+        for data in [*related_tweets.values(), *tweets.values()]:
+            users[data["user"]["twitter_id"]] = data["user"]
+        with self.timings.measure("user_upsert"):
+            user_pks = self._write_users(users)
+
+        with self.timings.measure("tweet_upsert"):
+            existing_ids = set(
+                Tweet.objects.filter(twitter_id__in=tweets).values_list(
+                    "twitter_id", flat=True
+                )
+            )
+
+            # Related tweets don't belong to the request, so scraping_request is left untouched
+            self._upsert_tweets(related_tweets, user_pks, TWEET_UPDATE_FIELDS)
+            self._upsert_tweets(
+                tweets,
+                user_pks,
+                TWEET_UPDATE_FIELDS + ["scraping_request"],
+                scraping_request_id=self.req_id,
+            )
+
+        with self.timings.measure("link_resolution"):
+            Tweet.objects.resolve_related_tweets([*related_tweets, *tweets])
+
+        created_ids = [t for t in tweets if t not in existing_ids]
+        updated_ids = [t for t in tweets if t in existing_ids]
+        return created_ids, updated_ids
+
+    def _write_users(self, users):
+        """Upserts only new or changed users, and returns the pks of all of them"""
+        user_pks = {}
+        changed_users = {}
+        for twitter_id, user_data in users.items():
+            user = self.user_cache.get(user_data)
+            if user:
+                user_pks[twitter_id] = user.pk
+            else:
+                changed_users[twitter_id] = user_data
+        if not changed_users:
+            return user_pks
+
+        TwitterUser.objects.bulk_create(
+            [TwitterUser(**user_data) for user_data in changed_users.values()],
+            update_conflicts=True,
+            unique_fields=["twitter_id"],
+            update_fields=USER_UPDATE_FIELDS,
+        )
+        for user in TwitterUser.objects.filter(twitter_id__in=changed_users):
+            self.user_cache.add(changed_users[user.twitter_id], user)
+            user_pks[user.twitter_id] = user.pk
+        return user_pks
+
+    def _upsert_tweets(self, tweets, user_pks, update_fields, **extra_fields):
+        if not tweets:
+            return
+        objs = []
+        for data in tweets.values():
+            fields = {k: v for k, v in data.items() if k != "user"}
+            fields.update(extra_fields)
+            user_id = user_pks[data["user"]["twitter_id"]]
+            objs.append(Tweet(user_id=user_id, **fields))
+        Tweet.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["twitter_id"],
+            update_fields=update_fields,
+        )
+
+    def _write_one_by_one(self, tweets, related_tweets):
+        created_ids = []
+        updated_ids = []
+        for data in [*related_tweets.values(), *tweets.values()]:
+            twitter_id = data["twitter_id"]
+            is_related = twitter_id not in tweets
+            try:
+                with transaction.atomic():
+                    user = self.user_cache.get(data["user"])
+                    if not user:
+                        user_data = dict(data["user"])
+                        user, _ = TwitterUser.objects.update_or_create(
+                            twitter_id=user_data.pop("twitter_id"), defaults=user_data
+                        )
+                        self.user_cache.add(data["user"], user)
+                    defaults = {
+                        k: v for k, v in data.items() if k not in ["user", "twitter_id"]
+                    }
+                    if not is_related:
+                        defaults["scraping_request_id"] = self.req_id
+                    tweet, created = Tweet.objects.update_or_create(
+                        twitter_id=twitter_id, defaults={**defaults, "user": user}
+                    )
+                    tweet.fetch_related_tweets()
+            except Exception as e:
+                logger.error(
+                    f"req_id={self.req_id}: Exceção ao salvar tweet {twitter_id}: {e}"
+                )
+                continue
+            if is_related:
+                continue
+            if created:
+                created_ids.append(twitter_id)
+            else:
+                updated_ids.append(twitter_id)
+        return created_ids, updated_ids
+
+
+class ScraperPrefetcher:
+    """Iterates over a scraper's items while a background thread fetches the next ones.
+
+    The thread fills a bounded queue, so it blocks once it is queue_size items ahead
+    and fetching never runs away from writing. Exceptions raised by the scraper are
+    re-raised by next() in the consuming thread. With no queue_size the items are
+    fetched in turn, in the consuming thread.
+    """
+
+    _DONE = object()
+
+    def __init__(self, items, queue_size=None):
+        self.items = iter(items)
+        self.thread = None
+        self.finished = False
+        if queue_size:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.stopped = threading.Event()
+            self.thread = threading.Thread(target=self._produce, daemon=True)
+            self.thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.thread:
+            return next(self.items)
+        if self.finished:
+            raise StopIteration
+
+        item = self.queue.get()
+        if item is self._DONE:
+            self.finished = True
+            raise StopIteration
+        if isinstance(item, _ScraperError):
+            self.finished = True
+            raise item.exception
+        return item
+
+    def close(self):
+        """Stops fetching, for when the consumer doesn't need the remaining items, and
+        closes the scraper's generator, finishing a cassette being recorded
+        """
+        if not self.thread:
+            self._close_items()
+            return
+        self.finished = True
+        self.stopped.set()
+        # Unblocks the producer if it is waiting for room in the queue
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.thread.join(timeout=1)
+
+    def _produce(self):
+        try:
+            for item in self.items:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._put(_ScraperError(e))
+        else:
+            self._put(self._DONE)
+        finally:
+            # Generators can only be closed by the thread running them
+            self._close_items()
+            # Connections opened by the scraper in this thread, like the ones of the shared
+            # rate limit, would otherwise be left open when the thread ends
+            connections.close_all()
+
+    def _close_items(self):
+        close = getattr(self.items, "close", None)
+        if close:
+            close()
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class _ScraperError:
+    def __init__(self, exception):
+        self.exception = exception
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from tweets.benchmarks import (
+    BENCHMARKS,
+    find_regressions,
+    load_baseline,
+    run_benchmark,
+    save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = "Measures the ingestion throughput of synthetic tweets in a throwaway test database, failing on regressions from the stored baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[1000, 10000, 100000]
+        )
+        parser.add_argument(
+            "--benchmarks",
+            nargs="+",
+            choices=list(BENCHMARKS),
+            default=list(BENCHMARKS),
+        )
+        parser.add_argument(
+            "--baseline", default=f"{settings.BASE_DIR}/ingestion_baseline.json"
+        )
+        parser.add_argument("--save-baseline", action="store_true")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Fraction a measurement may be worse than the baseline",
+        )
+
+    def handle(self, *args, **options):
+        if not options["save_baseline"]:
+            try:
+                baseline = load_baseline(options["baseline"])
+            except FileNotFoundError:
+                raise CommandError(
+                    f"Baseline {options['baseline']} not found, create it with --save-baseline"
+                )
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run_benchmarks(
+                options["benchmarks"], sorted(options["sizes"])
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["save_baseline"]:
+            save_baseline(options["baseline"], results)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+
+        regressions = find_regressions(results, baseline, options["tolerance"])
+        if regressions:
+            raise CommandError("Regressions:\n" + "\n".join(regressions))
+
+    def run_benchmarks(self, benchmarks, sizes):
+        results = {}
+        for size in sizes:
+            for name in benchmarks:
+                result = run_benchmark(name, size)
+                results[f"{name}:{size}"] = result
+                self.stdout.write(
+                    f"{name} {size} tweets: {result['tweets_per_sec']:.0f} tweets/s, "
+                    + f"{result['queries_per_tweet']:.2f} queries/tweet, "
+                    + f"peak RSS {result['peak_rss_mb']:.0f} MB"
+                )
+        return results
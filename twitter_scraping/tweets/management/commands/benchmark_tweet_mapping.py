@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+import timeit
+
+from tweets.mappers import map_tweet
+from tweets.serializers import SnscrapeTweetSerializer
+from tweets.tweet_samples import (
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_retweet,
+    user_tweet_1,
+    user_tweet_2,
+    user_tweet_3,
+)
+
+SAMPLE_TWEETS = [
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_retweet,
+    user_tweet_1,
+    user_tweet_2,
+    user_tweet_3,
+]
+
+
+def validate_with_serializer(raw_tweet):
+    serializer = SnscrapeTweetSerializer(data=raw_tweet)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+class Command(BaseCommand):
+    help = "Compares the time to validate a scraped tweet with the DRF serializer and with the ingestion mapper"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        results = {}
+        for name, validate in [
+            ("serializer", validate_with_serializer),
+            ("mapper", map_tweet),
+        ]:
+            timings = timeit.repeat(
+                lambda: [validate(tweet) for tweet in SAMPLE_TWEETS],
+                number=number,
+                repeat=options["repeat"],
+            )
+            results[name] = min(timings) / (number * len(SAMPLE_TWEETS))
+            self.stdout.write(f"{name}: {results[name] * 1e6:.1f} µs/tweet")
+
+        self.stdout.write(f"speedup: {results['serializer'] / results['mapper']:.1f}x")
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+import time
+
+from tweets.corpus import generate_corpus
+
+
+class Command(BaseCommand):
+    help = "Streams a synthetic corpus of politician conversations, retweets and quotes into the database, for scale testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tweets", type=int, default=10000000)
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100000,
+            help="Number of users replying, besides the politicians",
+        )
+        parser.add_argument(
+            "--fanout",
+            type=float,
+            default=50,
+            help="Mean number of replies to a conversation, scaled by the popularity of the politician",
+        )
+        parser.add_argument(
+            "--branching",
+            type=float,
+            default=0.9,
+            help="Mean number of replies to a reply, close to 1 for deep reply trees",
+        )
+        parser.add_argument("--max-depth", type=int, default=50)
+        parser.add_argument("--max-conversation-size", type=int, default=20000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of the popularity of politicians and of the users replying",
+        )
+        parser.add_argument("--retweet-ratio", type=float, default=0.1)
+        parser.add_argument("--quote-ratio", type=float, default=0.05)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100000,
+            help="Number of rows copied per transaction",
+        )
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        copied = generate_corpus(
+            options["tweets"],
+            users=options["users"],
+            fanout=options["fanout"],
+            branching=options["branching"],
+            max_depth=options["max_depth"],
+            max_conversation_size=options["max_conversation_size"],
+            skew=options["skew"],
+            retweet_ratio=options["retweet_ratio"],
+            quote_ratio=options["quote_ratio"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+        )
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            f"Copied {copied['users']} users and {copied['tweets']} tweets in {elapsed:.0f}s"
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from tweets.tasks import resolve_related_tweets
+
+
+class Command(BaseCommand):
+    help = "Fills the reply, conversation, retweet and quote links of tweets that are still missing them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--twitter-ids",
+            nargs="+",
+            help="Only resolve these tweets and the tweets referencing them",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100000,
+            help="Number of pks updated per statement when resolving the whole table",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="run_async",
+            help="Send the work to a Celery worker instead of running it here",
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            "twitter_ids": options["twitter_ids"],
+            "chunk_size": options["chunk_size"],
+        }
+        if options["run_async"]:
+            result = resolve_related_tweets.delay(**kwargs)
+            self.stdout.write(f"Started task {result.id}")
+            return
+
+        resolved = resolve_related_tweets(**kwargs)
+        for fk_field, count in resolved.items():
+            self.stdout.write(f"{fk_field}: {count}")
@@ -0,0 +1,193 @@
+"""Maps snscrape objects to model fields, as a faster alternative to the DRF serializers.
+
+The field mappings below are resolved once, at import time, and mirror the validation
+done by SnscrapeTwitterUserSerializer and SnscrapeTweetSerializer: required fields,
+nulls, blanks, types and timezones. They also enforce the model max_lengths, so that an
+oversized value fails a single tweet instead of the database write of a whole batch.
+"""
+
+from datetime import date, datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.serializers import ValidationError
+import re
+
+from .models import Tweet, TwitterUser
+
+_MISSING = object()
+DECIMAL_ZEROS = re.compile(r"\.0*\s*$")
+
+
+class MappingError(Exception):
+    pass
+
+
+def to_str(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise MappingError("Not a valid string.")
+    return str(value).strip()
+
+
+def to_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(DECIMAL_ZEROS.sub("", value))
+        except ValueError:
+            pass
+    raise MappingError("A valid integer is required.")
+
+
+def to_datetime(value):
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            value = None
+    if not isinstance(value, datetime):
+        if isinstance(value, date):
+            raise MappingError("Expected a datetime but got a date.")
+        raise MappingError("Datetime has wrong format.")
+    if timezone.is_aware(value):
+        return value.astimezone(timezone.get_current_timezone())
+    return timezone.make_aware(value)
+
+
+class FieldMapping:
+    __slots__ = [
+        "source",
+        "target",
+        "coerce",
+        "allow_null",
+        "allow_blank",
+        "max_length",
+    ]
+
+    def __init__(
+        self,
+        source,
+        target,
+        coerce,
+        model=None,
+        allow_null=False,
+        allow_blank=False,
+    ):
+        self.source = source
+        self.target = target
+        self.coerce = coerce
+        self.allow_null = allow_null
+        self.allow_blank = allow_blank
+        self.max_length = model._meta.get_field(target).max_length if model else None
+
+    def map(self, data):
+        value = data.get(self.source, _MISSING)
+        if value is _MISSING:
+            raise MappingError("This field is required.")
+        if value is None:
+            if not self.allow_null:
+                raise MappingError("This field may not be null.")
+            return None
+        value = self.coerce(value)
+        if value == "" and not self.allow_blank:
+            raise MappingError("This field may not be blank.")
+        if self.max_length and len(value) > self.max_length:
+            raise MappingError(
+                f"Ensure this field has no more than {self.max_length} characters."
+            )
+        return value
+
+
+USER_MAPPINGS = [
+    FieldMapping("id", "twitter_id", to_str, TwitterUser),
+    FieldMapping("username", "username", to_str, TwitterUser),
+    FieldMapping("displayname", "display_name", to_str, TwitterUser),
+    FieldMapping(
+        "rawDescription",
+        "description",
+        to_str,
+        TwitterUser,
+        allow_null=True,
+        allow_blank=True,
+    ),
+    FieldMapping("created", "account_created_at", to_datetime),
+    FieldMapping(
+        "location", "location", to_str, TwitterUser, allow_null=True, allow_blank=True
+    ),
+    FieldMapping("followersCount", "followers_count", to_int),
+    FieldMapping("friendsCount", "following_count", to_int),
+    FieldMapping("statusesCount", "tweet_count", to_int),
+    FieldMapping("listedCount", "listed_count", to_int),
+]
+
+TWEET_MAPPINGS = [
+    FieldMapping("id", "twitter_id", to_str, Tweet),
+    FieldMapping("rawContent", "content", to_str, Tweet),
+    FieldMapping("date", "published_at", to_datetime),
+    FieldMapping(
+        "inReplyToTweetId",
+        "in_reply_to_id",
+        to_str,
+        Tweet,
+        allow_null=True,
+        allow_blank=True,
+    ),
+    FieldMapping(
+        "conversationId",
+        "conversation_id",
+        to_str,
+        Tweet,
+        allow_null=True,
+        allow_blank=True,
+    ),
+    FieldMapping("replyCount", "reply_count", to_int),
+    FieldMapping("retweetCount", "retweet_count", to_int),
+    FieldMapping("likeCount", "like_count", to_int),
+    FieldMapping("quoteCount", "quote_count", to_int),
+    FieldMapping("viewCount", "view_count", to_int, allow_null=True),
+]
+
+# Model fields that can't be null, even though the serializers accept null for them
+USER_NULL_DEFAULTS = {"description": "", "location": ""}
+
+
+def map_fields(data, mappings):
+    values = {}
+    errors = {}
+    for mapping in mappings:
+        try:
+            values[mapping.target] = mapping.map(data)
+        except MappingError as e:
+            errors[mapping.source] = [str(e)]
+    return values, errors
+
+
+def map_user(raw_user):
+    """Returns the TwitterUser fields of a snscrape.User, or raises ValidationError"""
+    values, errors = map_fields(raw_user.__dict__, USER_MAPPINGS)
+    if errors:
+        raise ValidationError(errors)
+    for field, default in USER_NULL_DEFAULTS.items():
+        if values[field] is None:
+            values[field] = default
+    return values
+
+
+def map_tweet(raw_tweet):
+    """Returns the Tweet fields of a snscrape.Tweet, with the user fields under "user",
+    or raises ValidationError
+    """
+    values, errors = map_fields(raw_tweet.__dict__, TWEET_MAPPINGS)
+    raw_user = raw_tweet.__dict__.get("user")
+    if raw_user is None:
+        errors["user"] = ["This field is required."]
+    else:
+        try:
+            values["user"] = map_user(raw_user)
+        except ValidationError as e:
+            errors["user"] = e.detail
+    if errors:
+        raise ValidationError(errors)
+    return values
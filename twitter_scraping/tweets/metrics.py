@@ -0,0 +1,139 @@
+"""Prometheus metrics of the scraping and ingestion, served by the /metrics view.
+
+Tasks run in the Celery worker and the view in the Django server, so both need to point
+the PROMETHEUS_MULTIPROC_DIR environment variable to the same empty directory, where
+prometheus_client shares the metrics of every process. Without it, /metrics only shows
+the metrics of the process serving it.
+
+Counters are turned into rates by Prometheus, e.g. rate(tweets_ingested_total[5m]) for
+the tweets ingested per second, and the scraper error rate as
+rate(scraper_responses_total{outcome!="ok"}[5m]) / rate(scraper_responses_total[5m]).
+"""
+
+from celery.signals import (
+    task_failure,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+)
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.dispatch import receiver
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+import os
+import time
+
+from .models import ScrapingRequest
+
+TWEETS_INGESTED = Counter(
+    "tweets_ingested_total", "Scraped tweets written to the database", ["result"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Latency of the database queries", ["operation"]
+)
+SCRAPER_RESPONSE_SECONDS = Histogram(
+    "scraper_response_seconds",
+    "Latency of the requests made by the scrapers to Twitter, one per page or retry",
+    buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+)
+SCRAPER_RESPONSES = Counter(
+    "scraper_responses_total",
+    "Responses received by the scrapers: ok, throttled or rejected",
+    ["outcome"],
+)
+SCRAPER_FAILED_PAGES = Counter(
+    "scraper_failed_pages_total", "Pages the scrapers gave up on after their retries"
+)
+TASK_SECONDS = Histogram(
+    "celery_task_seconds",
+    "Duration of the Celery tasks",
+    ["task", "state"],
+    buckets=[0.1, 1, 10, 60, 300, 900, 1800, 3600, 7200, 14400],
+)
+TASK_FAILURES = Counter(
+    "celery_task_failures_total", "Celery tasks that raised an exception", ["task"]
+)
+
+DB_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COPY"}
+
+
+class ScrapingRequestStatusCollector:
+    """Counts the scraping requests by status, from the database, when metrics are read"""
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "scraping_requests", "Scraping requests by status", labels=["status"]
+        )
+        counts = dict(
+            ScrapingRequest.objects.order_by()
+            .values("status")
+            .annotate(count=Count("id"))
+            .values_list("status", "count")
+        )
+        for status, _ in ScrapingRequest.STATUS_CHOICES:
+            gauge.add_metric([status], counts.get(status, 0))
+        yield gauge
+
+
+def render():
+    """The current metrics in the Prometheus text format"""
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(ScrapingRequestStatusCollector())
+    return generate_latest(registry)
+
+
+def observe_query(execute, sql, params, many, context):
+    operation = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if operation not in DB_OPERATIONS:
+        operation = "OTHER"
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started_at)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_query)
+
+
+_task_started_at = {}
+
+
+@task_prerun.connect
+def task_started(task_id=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started_at
+        )
+
+
+@task_failure.connect
+def task_failed(sender=None, **kwargs):
+    TASK_FAILURES.labels(sender.name).inc()
+
+
+@worker_process_shutdown.connect
+def worker_process_finished(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
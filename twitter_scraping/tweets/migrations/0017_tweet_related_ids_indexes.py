@@ -0,0 +1,33 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0016_rename_scrappingrequest_scrapingrequest_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tweet",
+            name="conversation_id",
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="in_reply_to_id",
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="quoted_id",
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="retweeted_id",
+            field=models.CharField(blank=True, db_index=True, max_length=30, null=True),
+        ),
+    ]
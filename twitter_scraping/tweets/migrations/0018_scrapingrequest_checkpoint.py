@@ -0,0 +1,33 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0017_tweet_related_ids_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="checkpoint_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="checkpoint_tweet_id",
+            field=models.CharField(blank=True, max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="created_tweets_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="updated_tweets_count",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0018_scrapingrequest_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="incremental",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0019_scrapingrequest_incremental"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScrapingRequestEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("name", models.CharField(db_index=True, default="log", max_length=50)),
+                ("count", models.IntegerField(blank=True, null=True)),
+                ("message", models.TextField(blank=True)),
+                (
+                    "scraping_request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="tweets.scrapingrequest",
+                    ),
+                ),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+    ]
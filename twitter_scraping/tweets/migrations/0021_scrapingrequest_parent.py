@@ -0,0 +1,25 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0020_scrapingrequestevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="conversation_requests",
+                to="tweets.scrapingrequest",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0021_scrapingrequest_parent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="priority",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
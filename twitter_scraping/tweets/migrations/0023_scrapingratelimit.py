@@ -0,0 +1,48 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:48
+
+from django.db import migrations, models
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0022_scrapingrequest_priority"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScrapingRateLimit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name="created"
+                    ),
+                ),
+                (
+                    "modified",
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name="modified"
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("tokens", models.FloatField()),
+                ("rate", models.FloatField(verbose_name="tokens per second")),
+                ("refilled_at", models.DateTimeField()),
+            ],
+            options={
+                "get_latest_by": "modified",
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:50
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def interrupt_duplicate_requests(apps, schema_editor):
+    """Keeps only the oldest of the pending conversation requests that are duplicated"""
+    ScrapingRequest = apps.get_model("tweets", "ScrapingRequest")
+    pending = ScrapingRequest.objects.filter(
+        include_replies=True, status__in=["created", "started"]
+    )
+    duplicates = (
+        pending.values("username", "twitter_id", "since", "until")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        pending.filter(
+            username=duplicate["username"],
+            twitter_id=duplicate["twitter_id"],
+            since=duplicate["since"],
+            until=duplicate["until"],
+        ).exclude(id=duplicate["first_id"]).update(status="interrupted")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0023_scrapingratelimit"),
+    ]
+
+    operations = [
+        migrations.RunPython(interrupt_duplicate_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="scrapingrequest",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("include_replies", True), ("status__in", ["created", "started"])
+                ),
+                fields=("username", "twitter_id", "since", "until"),
+                name="unique_pending_conversation_request",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1.10 on 2026-10-18 19:51
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_requests(apps, schema_editor):
+    """Merges the duplicated profile requests into the oldest one, along with their
+    tweets, events and conversation requests
+    """
+    ScrapingRequest = apps.get_model("tweets", "ScrapingRequest")
+    Tweet = apps.get_model("tweets", "Tweet")
+    ScrapingRequestEvent = apps.get_model("tweets", "ScrapingRequestEvent")
+    duplicates = (
+        ScrapingRequest.objects.filter(twitter_id__isnull=True)
+        .values("username", "since", "until", "include_replies")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        first_id = duplicate.pop("first_id")
+        duplicate.pop("count")
+        duplicate_ids = list(
+            ScrapingRequest.objects.filter(twitter_id__isnull=True, **duplicate)
+            .exclude(id=first_id)
+            .values_list("id", flat=True)
+        )
+        Tweet.objects.filter(scraping_request_id__in=duplicate_ids).update(
+            scraping_request_id=first_id
+        )
+        ScrapingRequestEvent.objects.filter(
+            scraping_request_id__in=duplicate_ids
+        ).update(scraping_request_id=first_id)
+        ScrapingRequest.objects.filter(parent_id__in=duplicate_ids).update(
+            parent_id=first_id
+        )
+        ScrapingRequest.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0024_unique_pending_conversation_request"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="scrapingrequest",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("twitter_id__isnull", True)),
+                fields=("username", "since", "until", "include_replies"),
+                name="unique_profile_request",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0025_unique_profile_request"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
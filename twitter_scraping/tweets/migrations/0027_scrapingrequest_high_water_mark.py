@@ -0,0 +1,18 @@
+# Generated by Django 4.1.10 on 2026-10-18 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0026_scrapingrequest_heartbeat_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scrapingrequest",
+            name="high_water_mark",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,15 +1,180 @@
-from datetime import datetime
-from django.db import models, transaction
-from django.db.models import CharField
-from django.db.models.functions import Length
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import (
+    CharField,
+    Exists,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    Window,
+)
+from django.db.models.functions import Coalesce, Extract, Floor, Length, RowNumber
 from django.utils import timezone
 from django.utils.text import Truncator
 from django_extensions.db.models import TimeStampedModel
+from .timings import StageTimings
 from .values import BAD_WORDS
 
 
 CharField.register_lookup(Length)
 
+# Statuses of the requests that are waiting for or running their scraping
+PENDING_STATUSES = ["created", "started"]
+
+# Postgres advisory lock key held by the scheduler while it claims scraping requests
+SCHEDULER_LOCK_ID = 20230427
+
+
+# Candidates ranked per free slot, to make up for the ones skipped for being locked
+CLAIM_CANDIDATES_PER_SLOT = 5
+
+
+class ScrapingRequestManager(models.Manager):
+    def queue_order(self):
+        """The created requests in the order they should be started.
+
+        Higher priorities go first, and a request gains one priority point for every
+        SCRAPING_PRIORITY_AGING_HOURS it waits, so low priority requests aren't starved.
+        Within the same priority, usernames take turns: the first request of every
+        username goes before the second request of any of them.
+        """
+        priority = F("priority")
+        if settings.SCRAPING_PRIORITY_AGING_HOURS:
+            waiting_seconds = Value(timezone.now().timestamp()) - Extract(
+                "created", "epoch"
+            )
+            priority = Floor(
+                priority
+                + waiting_seconds / (settings.SCRAPING_PRIORITY_AGING_HOURS * 3600),
+                output_field=FloatField(),
+            )
+        return (
+            self.filter(status="created")
+            .annotate(
+                effective_priority=priority,
+                username_turn=Window(
+                    RowNumber(),
+                    partition_by=[F("username")],
+                    order_by=[F("priority").desc(), F("id").asc()],
+                ),
+            )
+            .order_by("-effective_priority", "username_turn", "id")
+        )
+
+    def claim(self, req_id):
+        """Marks a created request as started, returning whether it was still created"""
+        started = timezone.now()
+        return bool(
+            self.filter(id=req_id, status="created").update(
+                status="started", started=started, heartbeat_at=started
+            )
+        )
+
+    def requeue_expired(self):
+        """Puts the started requests without a heartbeat for SCRAPING_LEASE_MINUTES back in
+        the queue, keeping their checkpoints so that they resume, and returns their ids.
+
+        Profile requests waiting for their conversation requests aren't scraping themselves,
+        so they don't expire.
+        """
+        if not settings.SCRAPING_LEASE_MINUTES:
+            return []
+        expires_at = timezone.now() - timedelta(minutes=settings.SCRAPING_LEASE_MINUTES)
+        expired_ids = list(
+            self.filter(status="started")
+            .alias(
+                last_heartbeat=Coalesce(
+                    "heartbeat_at",
+                    "started",
+                    "modified",
+                    output_field=models.DateTimeField(),
+                )
+            )
+            .filter(last_heartbeat__lt=expires_at)
+            .exclude(self.waiting_for_conversations())
+            .values_list("id", flat=True)
+        )
+        if expired_ids:
+            self.filter(id__in=expired_ids).update(
+                status="created", started=None, heartbeat_at=None
+            )
+            ScrapingRequestEvent.objects.bulk_create(
+                [
+                    ScrapingRequestEvent(
+                        scraping_request_id=req_id,
+                        message="Heartbeat expirado, voltando para a fila",
+                    )
+                    for req_id in expired_ids
+                ]
+            )
+        return expired_ids
+
+    def waiting_for_conversations(self):
+        """Condition of the requests with conversation requests still pending"""
+        return Exists(self.filter(parent=OuterRef("pk"), status__in=PENDING_STATUSES))
+
+    def claim_next(self, max_running):
+        """Marks as started and returns the next created requests, up to max_running started
+        requests in total.
+
+        Concurrent schedulers are serialized by a transaction level advisory lock: if another
+        one holds it, nothing is claimed, since that one is already filling the free slots.
+        Rows locked by other transactions are skipped instead of waited for. Requests whose
+        worker stopped are put back in the queue first, see requeue_expired.
+        """
+        connection = connections[self.db]
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_try_advisory_xact_lock(%s)", [SCHEDULER_LOCK_ID]
+                )
+                if not cursor.fetchone()[0]:
+                    return []
+
+            self.requeue_expired()
+            # Requests waiting for their conversation requests leave the slot to them
+            running = self.filter(status="started").exclude(
+                self.waiting_for_conversations()
+            )
+            slots = max_running - running.count()
+            if slots <= 0:
+                return []
+            # Postgres doesn't allow FOR UPDATE along with window functions,
+            # so the candidates are ranked first and locked afterwards
+            candidate_ids = list(
+                self.queue_order()[: slots * CLAIM_CANDIDATES_PER_SLOT].values_list(
+                    "id", flat=True
+                )
+            )
+            unlocked_ids = set(
+                self.filter(id__in=candidate_ids, status="created")
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)
+            )
+            claimed_ids = [
+                req_id for req_id in candidate_ids if req_id in unlocked_ids
+            ][:slots]
+            reqs = sorted(
+                self.filter(id__in=claimed_ids).defer("logs"),
+                key=lambda req: claimed_ids.index(req.id),
+            )
+            started = timezone.now()
+            self.filter(id__in=[req.id for req in reqs]).update(
+                status="started", started=started, heartbeat_at=started
+            )
+            for req in reqs:
+                req.status = "started"
+                req.started = started
+                req.heartbeat_at = started
+        return reqs
+
 
 class ScrapingRequest(TimeStampedModel):
     STATUS_CHOICES = [
@@ -24,12 +189,43 @@ class ScrapingRequest(TimeStampedModel):
     until = models.DateTimeField(null=True, blank=True)
     recurse = models.BooleanField(default=False)
     include_replies = models.BooleanField(default=True)
+    incremental = models.BooleanField(default=False)
     started = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
     finished = models.DateTimeField(null=True, blank=True)
     status = models.CharField(
         max_length=12, choices=STATUS_CHOICES, db_index=True, default="created"
     )
+    priority = models.IntegerField(default=0, db_index=True)
     logs = models.TextField(null=True, blank=True)
+    checkpoint_tweet_id = models.CharField(max_length=30, null=True, blank=True)
+    checkpoint_at = models.DateTimeField(null=True, blank=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    created_tweets_count = models.IntegerField(default=0)
+    updated_tweets_count = models.IntegerField(default=0)
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="conversation_requests",
+    )
+
+    objects = ScrapingRequestManager()
+
+    class Meta(TimeStampedModel.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["username", "twitter_id", "since", "until"],
+                condition=Q(include_replies=True, status__in=PENDING_STATUSES),
+                name="unique_pending_conversation_request",
+            ),
+            models.UniqueConstraint(
+                fields=["username", "since", "until", "include_replies"],
+                condition=Q(twitter_id__isnull=True),
+                name="unique_profile_request",
+            ),
+        ]
 
     @property
     def duration(self):
@@ -44,17 +240,122 @@ class ScrapingRequest(TimeStampedModel):
         return f"<ScrapingRequest: id={self.id}, username={self.username}, include_replies={self.include_replies}>"
 
     def log(self, msg):
-        if self.logs:
-            self.logs = self.logs + msg + "\n"
-        else:
-            self.logs = msg + "\n"
-        self.save()
+        """Appends a message to the request events, without rewriting the request row"""
+        ScrapingRequestEvent.objects.create(scraping_request=self, message=msg)
+
+    def log_counts(self, **counts):
+        """Appends one counter event per keyword argument, all in a single query"""
+        ScrapingRequestEvent.objects.bulk_create(
+            [
+                ScrapingRequestEvent(scraping_request=self, name=name, count=count)
+                for name, count in counts.items()
+            ]
+        )
 
-    def create_scraping_task(self):
-        from .tasks import scrape_user_tweets, scrape_tweet_replies
+    def get_counts(self):
+        """Sums the counter events of the request by name, since its last reset"""
+        last_reset = self.events.filter(name="reset").order_by("-id").values("id")[:1]
+        return dict(
+            self.events.filter(
+                count__isnull=False, id__gt=Coalesce(Subquery(last_reset), 0)
+            )
+            .values("name")
+            .annotate(total=Sum("count"))
+            .values_list("name", "total")
+        )
 
+    def get_timings(self):
+        """Seconds spent in each scraping stage, summed over the runs since the last reset"""
+        return StageTimings.from_counts(self.get_counts())
+
+    def get_logs(self):
+        """The legacy logs text followed by the request events, one per line"""
+        lines = [self.logs.rstrip("\n")] if self.logs else []
+        lines += [str(event) for event in self.events.order_by("id")]
+        return "\n".join(lines)
+
+    def save_checkpoint(self, created_ids, updated_ids, last_tweet_id):
+        """Records the progress of the scraping after each written batch of tweets,
+        updating only the checkpoint fields instead of saving the whole row. It's also the
+        heartbeat that keeps the request from expiring.
+        """
+        self.checkpoint_tweet_id = last_tweet_id
+        self.checkpoint_at = timezone.now()
+        self.heartbeat_at = self.checkpoint_at
+        self.created_tweets_count += len(created_ids)
+        self.updated_tweets_count += len(updated_ids)
+        ScrapingRequest.objects.filter(id=self.id).update(
+            checkpoint_tweet_id=self.checkpoint_tweet_id,
+            checkpoint_at=self.checkpoint_at,
+            heartbeat_at=self.heartbeat_at,
+            created_tweets_count=F("created_tweets_count") + len(created_ids),
+            updated_tweets_count=F("updated_tweets_count") + len(updated_ids),
+        )
+
+    def heartbeat(self):
+        """Renews the lease of the started request while it's fetching tweets, also when it
+        doesn't write any, at most once every SCRAPING_HEARTBEAT_SECONDS
+        """
+        now = timezone.now()
+        if self.heartbeat_at and now - self.heartbeat_at < timedelta(
+            seconds=settings.SCRAPING_HEARTBEAT_SECONDS
+        ):
+            return
+        self.heartbeat_at = now
+        ScrapingRequest.objects.filter(id=self.id, status="started").update(
+            heartbeat_at=self.heartbeat_at
+        )
+
+    def has_checkpoint(self):
+        return bool(self.checkpoint_tweet_id)
+
+    def get_checkpointed_tweet_ids(self):
+        """Twitter ids already written by this request, which don't need to be written again"""
+        if not self.has_checkpoint():
+            return set()
+        return set(self.tweets.values_list("twitter_id", flat=True))
+
+    def get_high_water_mark(self):
+        """Publish date of the user's newest tweet stored by a profile scraping of the request
+        period, where incremental scrapings stop. Tweets stored by conversation scrapings
+        don't count, since the profile tweets before them may not be stored yet.
+        """
+        tweets = Tweet.objects.filter(
+            user__username__iexact=self.username,
+            scraping_request__username__iexact=self.username,
+            scraping_request__twitter_id__isnull=True,
+        )
+        if self.since:
+            tweets = tweets.filter(published_at__gte=self.since)
+        if self.until:
+            tweets = tweets.filter(published_at__lt=self.until)
+        return tweets.aggregate(Max("published_at"))["published_at__max"]
+
+    def save_high_water_mark(self):
+        """Keeps the high-water mark of an incremental scraping that's starting, to be reused
+        when it resumes from a checkpoint, as the tweets it wrote itself would move the mark
+        past the ones it hasn't written yet.
+        """
+        self.high_water_mark = self.get_high_water_mark()
+        ScrapingRequest.objects.filter(id=self.id).update(
+            high_water_mark=self.high_water_mark
+        )
+
+    def clear_checkpoint(self):
+        self.checkpoint_tweet_id = None
+        self.checkpoint_at = None
+        self.high_water_mark = None
+        self.created_tweets_count = 0
+        self.updated_tweets_count = 0
+
+    def create_scraping_task(self):
         if self.status != "created":
-            self.reset()
+            # Interrupted requests resume from their last checkpoint
+            self.reset(keep_checkpoint=self.status == "interrupted")
+        self.dispatch_scraping_task()
+
+    def dispatch_scraping_task(self):
+        from .tasks import scrape_user_tweets, scrape_tweet_replies
 
         if self.include_replies:
             scrape_tweet_replies.delay(tweet_id=self.twitter_id, req_id=self.id)
@@ -62,38 +363,59 @@ class ScrapingRequest(TimeStampedModel):
             scrape_user_tweets.delay(req_id=self.id)
 
     def create_conversation_scraping_requests(self):
+        """Creates a conversation scraping request for every conversation started by the
+        tweets of this request, unless one is already pending, and returns them
+        """
         tweets = Tweet.objects.filter(
             scraping_request=self,
             in_reply_to_id__isnull=True,
         )
-        self.log(f"related_conversations={tweets.count()}")
-        reqs = []
-        with transaction.atomic():
-            # Using transactions to avoid db locks on SQLite: https://stackoverflow.com/questions/30438595/sqlite3-ignores-sqlite3-busy-timeout/30440711#30440711
-            for tweet in tweets:
-                if not ScrapingRequest.objects.filter(
+        related_conversations = tweets.count()
+        pending_requests = ScrapingRequest.objects.filter(
+            username=self.username,
+            twitter_id=OuterRef("twitter_id"),
+            since=self.since,
+            until=self.until,
+            include_replies=True,
+            status__in=PENDING_STATUSES,
+        )
+        twitter_ids = list(
+            tweets.exclude(Exists(pending_requests)).values_list(
+                "twitter_id", flat=True
+            )
+        )
+        # Requests created concurrently in the meantime are left out by the unique constraint
+        ScrapingRequest.objects.bulk_create(
+            [
+                ScrapingRequest(
                     username=self.username,
-                    twitter_id=tweet.twitter_id,
+                    twitter_id=twitter_id,
                     since=self.since,
                     until=self.until,
                     include_replies=True,
-                    status__in=["created", "started"],
-                ):
-                    req = ScrapingRequest.objects.create(
-                        username=self.username,
-                        twitter_id=tweet.twitter_id,
-                        since=self.since,
-                        until=self.until,
-                        include_replies=True,
-                        logs=f"parent_request={self.id}\nconversation_id={tweet.twitter_id}\n",
-                    )
-                    reqs.append(req)
-        req_ids = [req.id for req in reqs]
-        self.log(f"Created conversation scraping requests: {req_ids}")
+                    priority=settings.CONVERSATION_SCRAPING_PRIORITY,
+                    parent=self,
+                    logs=f"parent_request={self.id}\nconversation_id={twitter_id}\n",
+                )
+                for twitter_id in twitter_ids
+            ],
+            ignore_conflicts=True,
+        )
+        reqs = list(
+            ScrapingRequest.objects.filter(
+                parent=self, twitter_id__in=twitter_ids, status="created"
+            ).order_by("id")
+        )
+        self.log_counts(
+            related_conversations=related_conversations,
+            conversation_requests_created=len(reqs),
+        )
+        return reqs
 
     def start(self):
         self.status = "started"
         self.started = timezone.now()
+        self.heartbeat_at = self.started
         self.save()
 
     def finish(self):
@@ -106,11 +428,77 @@ class ScrapingRequest(TimeStampedModel):
         self.finished = timezone.now()
         self.save()
 
-    def reset(self):
+    def get_pending_duplicate(self):
+        """The other pending conversation request for the same tweet and period, which keeps
+        this one from being pending too, per unique_pending_conversation_request
+        """
+        values = dict(
+            username=self.username,
+            twitter_id=self.twitter_id,
+            since=self.since,
+            until=self.until,
+        )
+        # Nulls are distinct in the unique constraint
+        if not self.include_replies or None in values.values():
+            return None
+        return (
+            ScrapingRequest.objects.filter(
+                include_replies=True, status__in=PENDING_STATUSES, **values
+            )
+            .exclude(id=self.id)
+            .first()
+        )
+
+    def reset(self, keep_checkpoint=False):
+        if self.status not in PENDING_STATUSES:
+            duplicate = self.get_pending_duplicate()
+            if duplicate:
+                raise ValidationError(
+                    f"Request {self.id} can't be reset while request {duplicate.id} for the same tweet is pending"
+                )
         self.status = "created"
         self.started = None
+        self.heartbeat_at = None
         self.finished = None
+        if not keep_checkpoint:
+            self.clear_checkpoint()
         self.save()
+        if not keep_checkpoint:
+            # Counters before the marker belong to the previous attempt
+            ScrapingRequestEvent.objects.create(
+                scraping_request=self, name="reset", message="Reiniciado"
+            )
+
+
+class ScrapingRequestEvent(TimeStampedModel):
+    """Append-only log of a ScrapingRequest: either a named counter or a free text message"""
+
+    scraping_request = models.ForeignKey(
+        ScrapingRequest, on_delete=models.CASCADE, related_name="events"
+    )
+    name = models.CharField(max_length=50, default="log", db_index=True)
+    count = models.IntegerField(null=True, blank=True)
+    message = models.TextField(blank=True)
+
+    def __repr__(self) -> str:
+        return f"<ScrapingRequestEvent: id={self.id}, scraping_request_id={self.scraping_request_id}, name={self.name}>"
+
+    def __str__(self) -> str:
+        if self.count is not None:
+            return f"{self.name}={self.count}"
+        return self.message
+
+
+class ScrapingRateLimit(TimeStampedModel):
+    """State of a token bucket shared by all the scraping workers, see tweets.ratelimit"""
+
+    name = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField()
+    rate = models.FloatField("tokens per second")
+    refilled_at = models.DateTimeField()
+
+    def __repr__(self) -> str:
+        return f"<ScrapingRateLimit: name={self.name}, tokens={self.tokens}, rate={self.rate}>"
 
 
 class TwitterUser(TimeStampedModel):
@@ -135,7 +523,56 @@ class TwitterUser(TimeStampedModel):
         return f"https://twitter.com/{self.username}"
 
 
+RELATED_TWEET_FIELDS = {
+    "in_reply_to_tweet": "in_reply_to_id",
+    "conversation_tweet": "conversation_id",
+    "retweeted_tweet": "retweeted_id",
+    "quoted_tweet": "quoted_id",
+}
+
+
 class TweetManager(models.Manager):
+    def resolve_related_tweets(self, twitter_ids=None, pk_range=None):
+        """Fills the reply, conversation, retweet and quote foreign keys that are still null,
+        with one UPDATE ... FROM join on twitter_id per relationship.
+
+        If twitter_ids is given, only those tweets and the tweets referencing them are updated,
+        in a statement for each side of the join, since an OR of both can't use the indexes.
+        If pk_range is given, only tweets with pks in that (inclusive) range are updated.
+        Returns the number of updated rows per relationship.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        resolved = {}
+        with connection.cursor() as cursor:
+            for fk_field, id_field in RELATED_TWEET_FIELDS.items():
+                fk_column = qn(self.model._meta.get_field(fk_field).column)
+                id_column = qn(self.model._meta.get_field(id_field).column)
+                sql = (
+                    f"UPDATE {table} AS t SET {fk_column} = r.id FROM {table} AS r "
+                    f"WHERE r.twitter_id = t.{id_column} AND t.{fk_column} IS NULL"
+                )
+                params = []
+                if pk_range is not None:
+                    sql += " AND t.id BETWEEN %s AND %s"
+                    params += list(pk_range)
+                if twitter_ids is None:
+                    statements = [(sql, params)]
+                else:
+                    statements = [
+                        (
+                            f"{sql} AND {alias}.twitter_id = ANY(%s)",
+                            [*params, list(twitter_ids)],
+                        )
+                        for alias in ["t", "r"]
+                    ]
+                resolved[fk_field] = 0
+                for statement, statement_params in statements:
+                    cursor.execute(statement, statement_params)
+                    resolved[fk_field] += cursor.rowcount
+        return resolved
+
     def contains_hate_words(self):
         regex = r"\b(?:{})\b".format("|".join(BAD_WORDS))
         return self.filter(content__iregex=regex)
@@ -168,7 +605,9 @@ class Tweet(TimeStampedModel):
     twitter_id = models.CharField(max_length=30, db_index=True, unique=True)
     content = models.CharField(max_length=300)
     published_at = models.DateTimeField("tweet publish date")
-    in_reply_to_id = models.CharField(max_length=30, null=True, blank=True)
+    in_reply_to_id = models.CharField(
+        max_length=30, db_index=True, null=True, blank=True
+    )
     in_reply_to_tweet = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -176,7 +615,9 @@ class Tweet(TimeStampedModel):
         blank=True,
         related_name="tweet_replies_set",
     )
-    conversation_id = models.CharField(max_length=30, null=True, blank=True)
+    conversation_id = models.CharField(
+        max_length=30, db_index=True, null=True, blank=True
+    )
     conversation_tweet = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -184,7 +625,7 @@ class Tweet(TimeStampedModel):
         blank=True,
         related_name="conversation_tweets_set",
     )
-    retweeted_id = models.CharField(max_length=30, null=True, blank=True)
+    retweeted_id = models.CharField(max_length=30, db_index=True, null=True, blank=True)
     retweeted_tweet = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -192,7 +633,7 @@ class Tweet(TimeStampedModel):
         blank=True,
         related_name="retweeted_tweets_set",
     )
-    quoted_id = models.CharField(max_length=30, null=True, blank=True)
+    quoted_id = models.CharField(max_length=30, db_index=True, null=True, blank=True)
     quoted_tweet = models.ForeignKey(
         "self",
         on_delete=models.SET_NULL,
@@ -224,23 +665,42 @@ class Tweet(TimeStampedModel):
     def get_twitter_url(self):
         return f"https://twitter.com/{self.user.username}/status/{self.twitter_id}"
 
-    def export(self):
+    @staticmethod
+    def export_columns():
+        """The exported columns, as fields or expressions for values_list(). Usernames are
+        joined through the related tweets, or looked up by twitter id while they aren't
+        linked yet, without linking them.
+        """
+
+        def related_username(fk_field, id_field):
+            lookup = Tweet.objects.filter(twitter_id=OuterRef(id_field)).values(
+                "user__username"
+            )[:1]
+            return Coalesce(f"{fk_field}__user__username", Subquery(lookup))
+
         return {
-            "id": self.twitter_id,
-            "date": self.published_at,
-            "user": self.user.username,
-            "content": self.content,
-            "in_reply_to_id": self.in_reply_to_id,
-            "in_reply_to_user": self.get_in_reply_to_user(),
-            "conversation_id": self.conversation_id,
-            "conversation_user": self.get_conversation_user(),
-            "reply_count": self.reply_count,
-            "retweet_count": self.retweet_count,
-            "like_count": self.like_count,
-            "quote_count": self.quote_count,
-            "view_count": self.view_count,
+            "id": "twitter_id",
+            "date": "published_at",
+            "user": "user__username",
+            "content": "content",
+            "in_reply_to_id": "in_reply_to_id",
+            "in_reply_to_user": related_username("in_reply_to_tweet", "in_reply_to_id"),
+            "conversation_id": "conversation_id",
+            "conversation_user": related_username(
+                "conversation_tweet", "conversation_id"
+            ),
+            "reply_count": "reply_count",
+            "retweet_count": "retweet_count",
+            "like_count": "like_count",
+            "quote_count": "quote_count",
+            "view_count": "view_count",
         }
 
+    def export(self):
+        columns = self.export_columns()
+        values = Tweet.objects.filter(pk=self.pk).values_list(*columns.values()).get()
+        return dict(zip(columns, values))
+
     def is_reply(self):
         return bool(self.in_reply_to_id)
 
@@ -309,7 +769,21 @@ class Tweet(TimeStampedModel):
             return None
 
     def fetch_related_tweets(self):
-        self.get_in_reply_to_tweet()
-        self.get_conversation_tweet()
-        self.get_retweeted_tweet()
-        self.get_quoted_tweet()
+        """Fills the missing related tweets that are already stored, loading all of them in
+        a single query and saving them in another one
+        """
+        missing = {
+            fk_field: getattr(self, id_field)
+            for fk_field, id_field in RELATED_TWEET_FIELDS.items()
+            if getattr(self, id_field) and getattr(self, f"{fk_field}_id") is None
+        }
+        if not missing:
+            return
+        tweets = Tweet.objects.in_bulk(set(missing.values()), field_name="twitter_id")
+        found = [
+            fk_field for fk_field, twitter_id in missing.items() if twitter_id in tweets
+        ]
+        for fk_field in found:
+            setattr(self, fk_field, tweets[missing[fk_field]])
+        if found:
+            self.save(update_fields=[*found, "modified"])
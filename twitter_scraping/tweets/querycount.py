@@ -0,0 +1,99 @@
+"""Counts the queries run by HTTP requests and Celery tasks, to find N+1 query patterns.
+
+Queries are grouped by fingerprint: their SQL with the literals and the lengths of the IN
+lists left out, so the same query run for every row of a list shares a fingerprint. A
+fingerprint repeated N_PLUS_ONE_THRESHOLD times or more is logged as a likely N+1, and so
+is any request or task running more than QUERY_COUNT_THRESHOLD queries.
+"""
+
+from celery.signals import task_postrun, task_prerun
+from celery.utils.log import get_task_logger
+from collections import Counter
+from django.conf import settings
+from django.db import connections
+import re
+
+logger = get_task_logger(__name__)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN \((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """The SQL of a query without its literals and the lengths of its IN lists"""
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LISTS.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class QueryCounter:
+    """Counts the queries run on a database connection while used as a context manager,
+    and how many times each fingerprint was run
+    """
+
+    def __init__(self, using="default"):
+        self.connection = connections[using]
+        self.fingerprints = Counter()
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.fingerprints[fingerprint(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.connection.execute_wrappers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.connection.execute_wrappers.remove(self)
+
+    def duplicates(self, threshold=2):
+        """Fingerprints run at least threshold times, the most repeated first"""
+        return {
+            sql: count
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        }
+
+    def report(self, name):
+        """Logs the count and the likely N+1 queries, when over the thresholds"""
+        n_plus_one = self.duplicates(settings.N_PLUS_ONE_THRESHOLD)
+        if self.count <= settings.QUERY_COUNT_THRESHOLD and not n_plus_one:
+            return
+        logger.warning(f"{name}: {self.count} queries")
+        for sql, count in n_plus_one.items():
+            logger.warning(f"{name}: query repetida {count} vezes: {sql}")
+
+
+class QueryCountMiddleware:
+    """Counts the queries of every request, reporting them and adding the count to the
+    X-Query-Count response header
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        counter.report(f"{request.method} {request.path}")
+        response["X-Query-Count"] = str(counter.count)
+        return response
+
+
+_task_counters = {}
+
+
+@task_prerun.connect
+def count_task_queries(task_id=None, **kwargs):
+    _task_counters[task_id] = QueryCounter().__enter__()
+
+
+@task_postrun.connect
+def report_task_queries(task_id=None, task=None, **kwargs):
+    counter = _task_counters.pop(task_id, None)
+    if counter is not None:
+        counter.__exit__(None, None, None)
+        counter.report(f"task_id={task_id}: {task.name}")
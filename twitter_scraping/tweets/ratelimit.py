@@ -0,0 +1,136 @@
+"""Rate limit shared by all the scraping workers, as a token bucket stored in the database.
+
+Every request made by a scraper takes a token first. Tokens are handed out at the bucket
+rate and can be taken ahead of time, so a worker reserves the next token and sleeps until
+it is due, without holding any lock meanwhile. When Twitter blocks a request the shared
+rate is halved, which slows down every worker instead of failing a single scraping, and it
+then recovers linearly over SCRAPING_RATE_RECOVERY_SECONDS.
+"""
+
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import time
+
+from .metrics import SCRAPER_FAILED_PAGES, SCRAPER_RESPONSE_SECONDS, SCRAPER_RESPONSES
+from .models import ScrapingRateLimit
+
+logger = get_task_logger(__name__)
+
+# Responses with which Twitter signals that requests are too frequent
+THROTTLED_STATUS_CODES = (403, 429)
+# The rate is never lowered below this fraction of SCRAPING_RATE_LIMIT
+MIN_RATE_FRACTION = 1 / 64
+
+
+class TokenBucket:
+    def __init__(self, name="twitter"):
+        self.name = name
+
+    @property
+    def enabled(self):
+        return bool(settings.SCRAPING_RATE_LIMIT)
+
+    def acquire(self):
+        """Takes a token, sleeping until it is due. Returns the seconds slept"""
+        if not self.enabled:
+            return 0
+        with transaction.atomic():
+            bucket = self._refilled_bucket()
+            bucket.tokens -= 1
+            bucket.save(update_fields=["tokens", "rate", "refilled_at", "modified"])
+
+        wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self):
+        """Halves the shared rate and drops the tokens left, after a blocked request"""
+        if not self.enabled:
+            return
+        with transaction.atomic():
+            bucket = self._refilled_bucket()
+            bucket.rate = max(bucket.rate / 2, self._min_rate())
+            bucket.tokens = min(bucket.tokens, 0)
+            bucket.save(update_fields=["tokens", "rate", "refilled_at", "modified"])
+        logger.warning(
+            f"Requisição bloqueada, reduzindo a taxa de raspagem para {bucket.rate:.3f}/s"
+        )
+
+    def _refilled_bucket(self):
+        max_rate = settings.SCRAPING_RATE_LIMIT
+        now = timezone.now()
+        bucket, created = ScrapingRateLimit.objects.select_for_update().get_or_create(
+            name=self.name,
+            defaults={
+                "tokens": settings.SCRAPING_RATE_BURST,
+                "rate": max_rate,
+                "refilled_at": now,
+            },
+        )
+        elapsed = max((now - bucket.refilled_at).total_seconds(), 0)
+        bucket.rate = min(
+            max_rate,
+            max(
+                bucket.rate
+                + elapsed * max_rate / settings.SCRAPING_RATE_RECOVERY_SECONDS,
+                self._min_rate(),
+            ),
+        )
+        bucket.tokens = min(
+            settings.SCRAPING_RATE_BURST, bucket.tokens + elapsed * bucket.rate
+        )
+        bucket.refilled_at = now
+        return bucket
+
+    def _min_rate(self):
+        return settings.SCRAPING_RATE_LIMIT * MIN_RATE_FRACTION
+
+
+def rate_limited(scraper, bucket=None):
+    """Makes every request sent by a snscrape scraper, retries included, take a token from
+    the shared bucket first, and lowers the shared rate whenever Twitter blocks one of them.
+    The latency and outcome of the requests are recorded in the scraper metrics.
+    """
+    bucket = bucket or TokenBucket()
+    request = scraper._request
+    send = scraper._session.send
+
+    def limited_send(*args, **kwargs):
+        # snscrape sends every attempt of its retry loop through the session, whether the
+        # previous one got a rejected response or a connection error
+        bucket.acquire()
+        sent_at = time.perf_counter()
+        response = send(*args, **kwargs)
+        SCRAPER_RESPONSE_SECONDS.observe(time.perf_counter() - sent_at)
+        return response
+
+    def limited_request(method, url, *args, responseOkCallback=None, **kwargs):
+        def check_response(r):
+            throttled = r.status_code in THROTTLED_STATUS_CODES
+            if throttled:
+                # The next attempt waits for a token of the lowered rate
+                bucket.penalize()
+            if responseOkCallback is None:
+                result = True, None
+            else:
+                result = responseOkCallback(r)
+            if throttled:
+                SCRAPER_RESPONSES.labels("throttled").inc()
+            else:
+                SCRAPER_RESPONSES.labels("ok" if result[0] else "rejected").inc()
+            return result
+
+        try:
+            return request(
+                method, url, *args, responseOkCallback=check_response, **kwargs
+            )
+        except Exception:
+            SCRAPER_FAILED_PAGES.inc()
+            raise
+
+    scraper._session.send = limited_send
+    scraper._request = limited_request
+    return scraper
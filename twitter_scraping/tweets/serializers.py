@@ -39,6 +39,40 @@ class SnscrapeTwitterUserSerializer(serializers.ModelSerializer):
         super().__init__(instance, data, **kwargs)
 
 
+class TwitterUserCache:
+    """In-process cache of the users already written by a task, keyed by twitter_id.
+    A user is written again only when its profile fields change.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.users)
+
+    @staticmethod
+    def fingerprint(user_data):
+        return tuple(sorted(user_data.items()))
+
+    def get(self, user_data):
+        """Returns the cached TwitterUser if its profile didn't change, or None"""
+        cached = self.users.get(user_data["twitter_id"])
+        if cached and cached[0] == self.fingerprint(user_data):
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        return None
+
+    def add(self, user_data, user):
+        self.users[user_data["twitter_id"]] = (self.fingerprint(user_data), user)
+
+    def discard(self, twitter_ids):
+        for twitter_id in twitter_ids:
+            self.users.pop(twitter_id, None)
+
+
 class SnscrapeTweetSerializer(serializers.ModelSerializer):
     id = serializers.CharField(source="twitter_id")
     user = SnscrapeTwitterUserSerializer()
@@ -80,8 +114,9 @@ class SnscrapeTweetSerializer(serializers.ModelSerializer):
 
     def __init__(self, instance=None, data=empty, **kwargs):
         if isinstance(data, SNTweet):
-            data.user = data.user.__dict__
-            data = data.__dict__
+            data = {**data.__dict__, "user": data.user}
+        if isinstance(data, dict) and isinstance(data.get("user"), SNUser):
+            data["user"] = data["user"].__dict__
         super().__init__(instance, data, **kwargs)
 
     def save(self, **kwargs):
@@ -94,9 +129,17 @@ class SnscrapeTweetSerializer(serializers.ModelSerializer):
 
     def get_or_create_user(self, validated_data):
         user_data = validated_data.pop("user")
+        user_cache = self.context.get("user_cache")
+        if user_cache is not None:
+            user = user_cache.get(user_data)
+            if user:
+                return user, False
+
         user, created = TwitterUser.objects.update_or_create(
             twitter_id=user_data.get("twitter_id"), defaults=user_data
         )
+        if user_cache is not None:
+            user_cache.add(user_data, user)
         return user, created
 
     def create(self, validated_data):
@@ -1,6 +1,6 @@
-from celery import shared_task
+from celery import chain, group, shared_task
 from celery.utils.log import get_task_logger
-from copy import deepcopy
+from contextlib import closing
 from datetime import datetime
 from django.utils import timezone
 from django.conf import settings
@@ -15,7 +15,11 @@ from snscrape.modules.twitter import (
 )
 import traceback
 
+from .cassettes import get_items
+from .ingestion import ScraperPrefetcher, TweetBatchWriter
+from .ratelimit import rate_limited
 from .serializers import SnscrapeTweetSerializer
+from .timings import StageTimings
 from .utils import tweet_to_json
 
 logger = get_task_logger(__name__)
@@ -24,36 +28,43 @@ logger = get_task_logger(__name__)
 @shared_task
 def scrape_tweet(tweet_id, mode=TwitterTweetScraperMode.SINGLE):
     mode = mode
-    tweet_scrapper = TwitterTweetScraper(tweet_id, mode=mode).get_items()
-    tweet = next(tweet_scrapper)
+    tweet_scrapper = get_items(
+        rate_limited(
+            TwitterTweetScraper(tweet_id, mode=mode, retries=settings.SCRAPING_RETRIES)
+        )
+    )
+    with closing(tweet_scrapper):
+        tweet = next(tweet_scrapper)
     return tweet
 
 
-def record_tweet(raw_tweet, req_id=None):
+def record_tweet(raw_tweet, req_id=None, user_cache=None):
     # Consider moving this to SnscrapeTweetSerializer
-    tweet = deepcopy(raw_tweet)
-    tweet.raw_tweet_object = tweet_to_json(tweet)
+    data = {**raw_tweet.__dict__, "user": raw_tweet.user.__dict__}
+    data["raw_tweet_object"] = tweet_to_json(raw_tweet)
 
-    if tweet.quotedTweet:
-        if type(tweet.quotedTweet) == SNTweet:
-            qt_tweet, created = record_tweet(tweet.quotedTweet)
-            tweet.quoted_id = qt_tweet.twitter_id
-            tweet.quoted_tweet = qt_tweet.id
+    if type(raw_tweet.quotedTweet) == SNTweet:
+        qt_tweet, created = record_tweet(raw_tweet.quotedTweet, user_cache=user_cache)
+        data["quoted_id"] = qt_tweet.twitter_id
+        data["quoted_tweet"] = qt_tweet.id
 
-        if type(tweet.quotedTweet) == Tombstone:
-            tweet.quoted_id = tweet.quotedTweet.id
+    if type(raw_tweet.quotedTweet) == Tombstone:
+        data["quoted_id"] = raw_tweet.quotedTweet.id
 
-    if tweet.retweetedTweet:
-        if type(tweet.retweetedTweet) == SNTweet:
-            rt_tweet, created = record_tweet(tweet.retweetedTweet)
-            tweet.retweeted_id = rt_tweet.twitter_id
-            tweet.retweeted_tweet = rt_tweet.id
+    if type(raw_tweet.retweetedTweet) == SNTweet:
+        rt_tweet, created = record_tweet(
+            raw_tweet.retweetedTweet, user_cache=user_cache
+        )
+        data["retweeted_id"] = rt_tweet.twitter_id
+        data["retweeted_tweet"] = rt_tweet.id
 
-        if type(tweet.retweetedTweet) == Tombstone:
-            tweet.retweeted_id = tweet.retweetedTweet.id
+    if type(raw_tweet.retweetedTweet) == Tombstone:
+        data["retweeted_id"] = raw_tweet.retweetedTweet.id
 
-    tweet.scraping_request = req_id
-    tweet_serializer = SnscrapeTweetSerializer(data=tweet)
+    data["scraping_request"] = req_id
+    tweet_serializer = SnscrapeTweetSerializer(
+        data=data, context={"user_cache": user_cache}
+    )
     if tweet_serializer.is_valid():
         tweet, created = tweet_serializer.save()
         # To Do: Retornar também outros tweets que tenham sido criados (rt ou qt)
@@ -68,7 +79,8 @@ def scrape_user_tweets(req_id):
         from .models import ScrapingRequest
 
         started_at = timezone.now()
-        req = ScrapingRequest.objects.get(id=req_id)
+        # The legacy logs aren't needed, and saving without them doesn't rewrite them
+        req = ScrapingRequest.objects.defer("logs").get(id=req_id)
         req.start()
 
         username = req.username
@@ -79,15 +91,40 @@ def scrape_user_tweets(req_id):
         tweets = []
         created_tweets = []
         updated_tweets = []
+        timings = StageTimings()
         MIN_TWEETS = (
             5  # É comum que usuários tenham 1 ou 2 tweets fixados no topo do perfil
         )
-        tweet_scrapper = TwitterProfileScraper(username).get_items()
+        writer = TweetBatchWriter(req_id, on_flush=req.save_checkpoint, timings=timings)
+        checkpointed_ids = req.get_checkpointed_tweet_ids()
+        if checkpointed_ids:
+            logger.info(
+                f"req_id={req_id}: Retomando a partir do tweet {req.checkpoint_tweet_id}, {len(checkpointed_ids)} tweets já gravados"
+            )
+        out_of_period_tweets = 0
+        if req.incremental and not req.has_checkpoint():
+            req.save_high_water_mark()
+        high_water_mark = req.high_water_mark if req.incremental else None
+        known_tweets_in_a_row = 0
+        known_tweets_skipped = 0
+
+        # The prefetcher starts scraping right away, so it's created after the queries that
+        # could raise before the loop closes it
+        tweet_scrapper = ScraperPrefetcher(
+            get_items(
+                rate_limited(
+                    TwitterProfileScraper(username, retries=settings.SCRAPING_RETRIES)
+                )
+            ),
+            settings.SCRAPING_PREFETCH_SIZE,
+        )
 
         # Loop manual necessário para que erros em tweets pontuais não travem o generator
         while True:
             try:
-                tweet = next(tweet_scrapper)
+                with timings.measure("fetch"):
+                    tweet = next(tweet_scrapper)
+                req.heartbeat()
                 if type(tweet) != SNTweet:
                     continue
                 tweets.append(tweet)
@@ -96,13 +133,27 @@ def scrape_user_tweets(req_id):
                         f"req_id={req_id}: Limite de raspagem atingido em {tweet.date}"
                     )
                     break
+                # Tweets fixados ou mais recentes que o período não são gravados
+                if tweet.date < req.since or (req.until and tweet.date >= req.until):
+                    out_of_period_tweets += 1
+                    continue
+                if str(tweet.id) in checkpointed_ids:
+                    continue
+                if high_water_mark:
+                    # Tweets fixados no topo do perfil já são conhecidos, mas não chegam a formar uma sequência
+                    if tweet.date <= high_water_mark:
+                        known_tweets_in_a_row += 1
+                        known_tweets_skipped += 1
+                        if known_tweets_in_a_row >= settings.INCREMENTAL_KNOWN_TWEETS:
+                            logger.info(
+                                f"req_id={req_id}: Limite incremental atingido em {tweet.date}"
+                            )
+                            break
+                        continue
+                    known_tweets_in_a_row = 0
 
                 try:
-                    t, created = record_tweet(tweet, req_id)
-                    if created:
-                        created_tweets.append(t)
-                    else:
-                        updated_tweets.append(t)
+                    writer.add(tweet)
                 except ValidationError as e:
                     logger.error(
                         f"req_id={req_id}: Erro de validação ao salvar tweet {tweet}: {e}"
@@ -120,15 +171,36 @@ def scrape_user_tweets(req_id):
                 logger.error(
                     f"req_id={req_id}: Exceção no tweet {tweet.id}: {e}:\n{tb}"
                 )
+                tweet_scrapper.close()
+                writer.flush()
                 raise
 
-        logger.info(f"req_id={req_id}: Encontrados {len(tweets)} tweets")
+        tweet_scrapper.close()
+        writer.flush()
+        created_tweets = writer.created_ids
+        updated_tweets = writer.updated_ids
+        logger.info(
+            f"req_id={req_id}: Encontrados {len(tweets)} tweets, {out_of_period_tweets} fora do período"
+        )
 
-        req.log(f"tweets={[t.id for t in tweets]}")
-        req.log(f"created_tweets={[t.twitter_id for t in created_tweets]}")
-        req.log(f"updated_tweets={[t.twitter_id for t in updated_tweets]}")
-        req.finish()
-        req.create_conversation_scraping_requests()
+        counts = dict(
+            tweets=len(tweets),
+            created_tweets=len(created_tweets),
+            updated_tweets=len(updated_tweets),
+            period_tweets=len(tweets) - out_of_period_tweets,
+            out_of_period_tweets=out_of_period_tweets,
+        )
+        if req.incremental:
+            counts["known_tweets_skipped"] = known_tweets_skipped
+        with timings.measure("log_writes"):
+            req.log_counts(**counts)
+        conversation_requests = req.create_conversation_scraping_requests()
+        if settings.CONVERSATION_FANOUT and conversation_requests:
+            # The request is finished by finish_conversation_scraping, once the conversations are scraped
+            fan_out_conversation_scraping(req, conversation_requests)
+        else:
+            req.finish()
+        req.log_counts(**timings.as_counts())
 
         finished_at = timezone.now()
         logger.info(
@@ -136,6 +208,7 @@ def scrape_user_tweets(req_id):
             + f"{len(created_tweets)} tweets criados, {len(updated_tweets)} tweets atualizados"
         )
         logger.info(f"req_id={req_id}: Tempo total={finished_at - started_at}")
+        logger.info(f"req_id={req_id}: Tempo por etapa={timings.as_dict()}")
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -148,43 +221,67 @@ def scrape_user_tweets(req_id):
     return {
         "created_tweets": len(created_tweets),
         "updated_tweets": len(updated_tweets),
+        "timings": timings.as_dict(),
     }
 
 
 @shared_task
-def scrape_tweet_replies(tweet_id, req_id):
+def scrape_tweet_replies(tweet_id, req_id, start_next=True, claim=False):
+    """Scrapes the conversation of tweet_id. With claim, the request is only scraped if it's
+    still created, as fanned out requests may have been started by the scheduler already.
+    """
     try:
         from .models import ScrapingRequest
 
         started_at = timezone.now()
-        req = ScrapingRequest.objects.get(id=req_id)
-        req.start()
+        created_tweets = []
+        updated_tweets = []
+        timings = StageTimings()
+        if claim and not ScrapingRequest.objects.claim(req_id):
+            logger.info(f"req_id={req_id}: ScrapingRequest já iniciado, ignorando")
+            return {"created_tweets": 0, "updated_tweets": 0, "timings": {}}
+        req = ScrapingRequest.objects.defer("logs").get(id=req_id)
+        if not claim:
+            req.start()
 
         username = req.username
         logger.info(
             f"req_id={req_id}: Iniciando scrape_tweet_replies com tweet_id={tweet_id}, username={username})"
         )
         tweets = []
-        created_tweets = []
-        updated_tweets = []
-
-        tweet_scraper = TwitterTweetScraper(
-            tweet_id, mode=TwitterTweetScraperMode.SCROLL
-        ).get_items()
+        writer = TweetBatchWriter(req_id, on_flush=req.save_checkpoint, timings=timings)
+        checkpointed_ids = req.get_checkpointed_tweet_ids()
+        if checkpointed_ids:
+            logger.info(
+                f"req_id={req_id}: Retomando a partir do tweet {req.checkpoint_tweet_id}, {len(checkpointed_ids)} tweets já gravados"
+            )
+
+        tweet_scraper = ScraperPrefetcher(
+            get_items(
+                rate_limited(
+                    TwitterTweetScraper(
+                        tweet_id,
+                        mode=TwitterTweetScraperMode.SCROLL,
+                        retries=settings.SCRAPING_RETRIES,
+                    )
+                )
+            ),
+            settings.SCRAPING_PREFETCH_SIZE,
+        )
 
         # Loop manual necessário para que erros em tweets pontuais não travem o generator
         while True:
             try:
-                tweet = next(tweet_scraper)
+                with timings.measure("fetch"):
+                    tweet = next(tweet_scraper)
+                req.heartbeat()
                 if type(tweet) != SNTweet:
                     continue
                 tweets.append(tweet)
+                if str(tweet.id) in checkpointed_ids:
+                    continue
                 try:
-                    t, created = record_tweet(tweet, req_id)
-                    if created:
-                        created_tweets.append(t)
-                    else:
-                        updated_tweets.append(t)
+                    writer.add(tweet)
                 except ValidationError as e:
                     logger.error(
                         f"req_id={req_id}: Erro de validação ao salvar tweet {tweet}: {e}"
@@ -201,12 +298,22 @@ def scrape_tweet_replies(tweet_id, req_id):
                 logger.error(
                     f"req_id={req_id}: Exceção no tweet {tweet.id}: {e}:\n{tb}"
                 )
+                tweet_scraper.close()
+                writer.flush()
                 raise
+        tweet_scraper.close()
+        writer.flush()
+        created_tweets = writer.created_ids
+        updated_tweets = writer.updated_ids
         logger.info(f"req_id={req_id}: Encontrados {len(tweets)} tweets")
 
-        req.log(f"tweets={[t.id for t in tweets]}")
-        req.log(f"created_tweets={[t.twitter_id for t in created_tweets]}")
-        req.log(f"updated_tweets={[t.twitter_id for t in updated_tweets]}")
+        with timings.measure("log_writes"):
+            req.log_counts(
+                tweets=len(tweets),
+                created_tweets=len(created_tweets),
+                updated_tweets=len(updated_tweets),
+            )
+        req.log_counts(**timings.as_counts())
         req.finish()
 
         finished_at = timezone.now()
@@ -215,6 +322,7 @@ def scrape_tweet_replies(tweet_id, req_id):
             + f"{len(created_tweets)} tweets criados, {len(updated_tweets)} tweets atualizados"
         )
         logger.info(f"req_id={req_id}: Tempo total={finished_at - started_at}")
+        logger.info(f"req_id={req_id}: Tempo por etapa={timings.as_dict()}")
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -223,18 +331,113 @@ def scrape_tweet_replies(tweet_id, req_id):
         )
         req.interrupt()
 
-    if settings.AUTO_START_SCRAPING:
+    if req.parent_id:
+        finish_conversation_scraping(req.parent_id)
+    if settings.AUTO_START_SCRAPING and start_next:
         start_next_scraping_request.delay()
 
     return {
         "created_tweets": len(created_tweets),
         "updated_tweets": len(updated_tweets),
+        "timings": timings.as_dict(),
     }
 
 
+def fan_out_conversation_scraping(parent, conversation_requests):
+    """Scrapes the conversation requests of a profile scraping as a Celery group of at most
+    CONVERSATION_FANOUT_CONCURRENCY chains. Each task claims its own request, and the last
+    conversation scraped finishes the parent. A chain that breaks interrupts the parent and
+    the conversations still pending.
+    """
+    concurrency = min(
+        settings.CONVERSATION_FANOUT_CONCURRENCY, len(conversation_requests)
+    )
+    chains = []
+    for i in range(concurrency):
+        tasks = [
+            scrape_tweet_replies.si(
+                req.twitter_id, req.id, start_next=False, claim=True
+            )
+            for req in conversation_requests[i::concurrency]
+        ]
+        chains.append(
+            chain(*tasks).on_error(interrupt_conversation_scraping.si(parent.id))
+        )
+    logger.info(
+        f"req_id={parent.id}: Raspando {len(conversation_requests)} conversas em {concurrency} filas paralelas"
+    )
+    return group(chains).apply_async()
+
+
+@shared_task
+def finish_conversation_scraping(parent_id):
+    """Finishes a fanned out profile scraping once all of its conversations are scraped,
+    resolving the links between the tweets saved by them. Called after every conversation
+    scraping, it only does so after the last one.
+    """
+    from .models import ScrapingRequest, Tweet
+
+    conversation_requests = ScrapingRequest.objects.filter(parent_id=parent_id)
+    if conversation_requests.filter(status__in=["created", "started"]).exists():
+        return None
+
+    # Concurrent chains finishing at the same time can't both finish the parent
+    finished = ScrapingRequest.objects.filter(id=parent_id, status="started").update(
+        status="finished", finished=timezone.now()
+    )
+    if not finished:
+        return None
+
+    twitter_ids = list(
+        Tweet.objects.filter(scraping_request__parent_id=parent_id).values_list(
+            "twitter_id", flat=True
+        )
+    )
+    timings = StageTimings()
+    with timings.measure("link_resolution"):
+        resolved = Tweet.objects.resolve_related_tweets(twitter_ids)
+    parent = ScrapingRequest.objects.defer("logs").get(id=parent_id)
+    parent.log_counts(
+        **timings.as_counts(),
+        conversation_requests_finished=conversation_requests.filter(
+            status="finished"
+        ).count(),
+        conversation_requests_interrupted=conversation_requests.filter(
+            status="interrupted"
+        ).count(),
+        resolved_related_tweets=sum(resolved.values()),
+    )
+    logger.info(f"req_id={parent_id}: Conversas raspadas, links resolvidos: {resolved}")
+
+    start_next_scraping_request.delay()
+    return resolved
+
+
+@shared_task
+def interrupt_conversation_scraping(parent_id):
+    """Error callback of the fanned out conversation scrapings: interrupts the parent and
+    the conversations that won't be scraped by the broken chain
+    """
+    from .models import PENDING_STATUSES, ScrapingRequest
+
+    interrupted = ScrapingRequest.objects.filter(
+        parent_id=parent_id, status__in=PENDING_STATUSES
+    ).update(status="interrupted", finished=timezone.now())
+    ScrapingRequest.objects.filter(id=parent_id, status="started").update(
+        status="interrupted", finished=timezone.now()
+    )
+    logger.error(
+        f"req_id={parent_id}: Raspagem das conversas interrompida, {interrupted} conversas pendentes"
+    )
+
+
 @shared_task
 def scrape_last_tweet_from_user(username):
-    tweet = next(TwitterProfileScraper(username).get_items())
+    tweet_scrapper = get_items(
+        rate_limited(TwitterProfileScraper(username, retries=settings.SCRAPING_RETRIES))
+    )
+    with closing(tweet_scrapper):
+        tweet = next(tweet_scrapper)
     return tweet
 
 
@@ -245,7 +448,7 @@ def scrape_tweets_and_replies(req_id):
         from .models import ScrapingRequest
 
         started_at = timezone.now()
-        req = ScrapingRequest.objects.get(id=req_id)
+        req = ScrapingRequest.objects.defer("logs").get(id=req_id)
         req.start()
 
         username = req.username
@@ -257,7 +460,9 @@ def scrape_tweets_and_replies(req_id):
 
         started_scraping_at = timezone.now()
         query = f"from:{username} since:{since} until:{until}"
-        user_scraping_results = TwitterSearchScraper(query).get_items()
+        user_scraping_results = get_items(
+            rate_limited(TwitterSearchScraper(query, retries=settings.SCRAPING_RETRIES))
+        )
         tweet_ids = []
         logger.info(f'Contando tweets do usuário "{username}"')
         for tweet in user_scraping_results:
@@ -271,7 +476,13 @@ def scrape_tweets_and_replies(req_id):
         else:
             mode = TwitterTweetScraperMode.SCROLL
         for tweet_id in tweet_ids:
-            tweet_scrapper = TwitterTweetScraper(tweet_id, mode=mode).get_items()
+            tweet_scrapper = get_items(
+                rate_limited(
+                    TwitterTweetScraper(
+                        tweet_id, mode=mode, retries=settings.SCRAPING_RETRIES
+                    )
+                )
+            )
             try:
                 # Loop manual necessário para que erros em tweets pontuais não travem o generator
                 while True:
@@ -332,31 +543,78 @@ def save_scrapped_tweet(tweet_data, req_id):
 
 
 @shared_task
-def create_scraping_requests(usernames, periods, include_replies=False):
+def create_scraping_requests(
+    usernames, periods, include_replies=False, incremental=False, priority=0
+):
+    """Creates the profile scraping requests of every username for every period, skipping
+    the ones that already exist, and returns the created ones.
+
+    Incremental requests refresh periods that were already scraped: their finished requests
+    are queued again as incremental ones, and returned along with the created ones.
+    """
     from .models import ScrapingRequest
 
-    created_requests = []
+    candidates = {}
     for period in periods:
         since = timezone.make_aware(datetime.strptime(period["since"], "%Y-%m-%d"))
         until = timezone.make_aware(datetime.strptime(period["until"], "%Y-%m-%d"))
-
         for username in usernames:
-            if not ScrapingRequest.objects.filter(
+            candidates[(username, since, until)] = period
+
+    existing_requests = ScrapingRequest.objects.filter(
+        username__in=usernames,
+        since__in={since for _, since, _ in candidates},
+        until__in={until for _, _, until in candidates},
+        include_replies=include_replies,
+        twitter_id__isnull=True,
+    )
+    existing = set(existing_requests.values_list("username", "since", "until"))
+    new_requests = {
+        key: period for key, period in candidates.items() if key not in existing
+    }
+
+    # Requests created concurrently in the meantime are left out by the unique constraint
+    ScrapingRequest.objects.bulk_create(
+        [
+            ScrapingRequest(
                 username=username,
                 since=since,
                 until=until,
                 include_replies=include_replies,
-            ).exists():
-                req = ScrapingRequest.objects.create(
-                    username=username, since=since, until=until
-                )
-                req.save()
-                created_requests.append(req)
-                logger.info(
-                    f"Criando ScrapingRequest(username={username}, since={period['since']}, until={period['until']}, include_replies={include_replies})"
-                )
+                incremental=incremental,
+                priority=priority,
+            )
+            for username, since, until in new_requests
+        ],
+        ignore_conflicts=True,
+    )
+    for (username, _, _), period in new_requests.items():
+        logger.info(
+            f"Criando ScrapingRequest(username={username}, since={period['since']}, until={period['until']}, include_replies={include_replies})"
+        )
 
+    created_requests = [
+        req
+        for req in existing_requests.order_by("id")
+        if (req.username, req.since, req.until) in new_requests
+    ]
     logger.info(f"Criados {len(created_requests)} ScrapingRequest's")
+
+    if incremental:
+        # There is a single profile request per period, so it's the one that is queued again
+        refreshed_requests = [
+            req
+            for req in existing_requests.filter(status="finished").order_by("id")
+            if (req.username, req.since, req.until) in candidates
+        ]
+        for req in refreshed_requests:
+            req.incremental = True
+            req.priority = priority
+            req.reset()
+        logger.info(
+            f"Reiniciados {len(refreshed_requests)} ScrapingRequest's incrementais"
+        )
+        created_requests += refreshed_requests
     return created_requests
 
 
@@ -364,18 +622,42 @@ def create_scraping_requests(usernames, periods, include_replies=False):
 def start_next_scraping_request():
     from .models import ScrapingRequest
 
-    running_requests_count = ScrapingRequest.objects.filter(status="started").count()
-    if running_requests_count >= settings.MAX_SCRAPINGS:
-        return
-
-    requests = list(ScrapingRequest.objects.filter(status="created"))
     started_reqs = []
-    while requests and running_requests_count < settings.MAX_SCRAPINGS:
-        req = requests.pop(0)
-        req.create_scraping_task()
+    for req in ScrapingRequest.objects.claim_next(settings.MAX_SCRAPINGS):
+        try:
+            req.dispatch_scraping_task()
+        except Exception as e:
+            logger.error(f"req_id={req.id}: Exceção ao iniciar ScrapingRequest: {e}")
+            # Releases the claim, so that the request can be started again
+            req.reset(keep_checkpoint=True)
+            continue
         logger.info(
             f"Iniciando ScrapingRequest(username={req.username}, since={req.since}, until={req.until})"
         )
-        running_requests_count += 1
         started_reqs.append(req.id)
     return started_reqs
+
+
+@shared_task
+def resolve_related_tweets(twitter_ids=None, chunk_size=None):
+    """Fills the still null related tweet foreign keys, optionally in chunks of pks"""
+    from django.db.models import Max, Min
+    from .models import Tweet, RELATED_TWEET_FIELDS
+
+    started_at = timezone.now()
+    if twitter_ids is not None or not chunk_size:
+        resolved = Tweet.objects.resolve_related_tweets(twitter_ids)
+    else:
+        resolved = {fk_field: 0 for fk_field in RELATED_TWEET_FIELDS}
+        pks = Tweet.objects.aggregate(min_pk=Min("id"), max_pk=Max("id"))
+        if pks["min_pk"] is not None:
+            for start in range(pks["min_pk"], pks["max_pk"] + 1, chunk_size):
+                chunk = Tweet.objects.resolve_related_tweets(
+                    pk_range=(start, start + chunk_size - 1)
+                )
+                for fk_field, count in chunk.items():
+                    resolved[fk_field] += count
+
+    finished_at = timezone.now()
+    logger.info(f"resolve_related_tweets: {resolved} em {finished_at - started_at}")
+    return resolved
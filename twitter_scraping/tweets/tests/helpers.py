@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from tweets.querycount import QueryCounter
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries of a TestCase, for hot paths that must not
+    grow a query per row
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_repeats=None):
+        """Fails when the block runs more than max_queries queries, or runs a query more
+        than max_repeats times, which is the sign of an N+1
+        """
+        with QueryCounter() as counter:
+            yield counter
+
+        queries = "\n".join(
+            f"{count}x {sql}" for sql, count in counter.fingerprints.most_common()
+        )
+        self.assertLessEqual(
+            counter.count,
+            max_queries,
+            f"{counter.count} queries over the budget of {max_queries}:\n{queries}",
+        )
+        if max_repeats is not None:
+            repeated = counter.duplicates(max_repeats + 1)
+            self.assertFalse(
+                repeated,
+                f"Queries repeated more than {max_repeats} times:\n{queries}",
+            )
@@ -0,0 +1,66 @@
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from snscrape.modules.twitter import Tombstone, Tweet as SNTweet
+
+from tweets.benchmarks import (
+    FIRST_TWEET_ID,
+    find_regressions,
+    run_benchmark,
+    synthetic_tweets,
+)
+from tweets.models import Tweet
+
+
+class SyntheticTweetsTest(SimpleTestCase):
+    def test_shapes(self):
+        tweets = list(synthetic_tweets(12, users=5))
+
+        ids = [tweet.id for tweet in tweets]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(len({tweet.user.id for tweet in tweets}), 5)
+        self.assertEqual(tweets[1].inReplyToTweetId, tweets[0].id)
+        self.assertEqual(tweets[2].inReplyToTweetId, tweets[1].id)
+        self.assertEqual(tweets[8].conversationId, tweets[6].id)
+        self.assertEqual(type(tweets[3].quotedTweet), SNTweet)
+        self.assertEqual(type(tweets[4].quotedTweet), Tombstone)
+        self.assertEqual(type(tweets[5].retweetedTweet), SNTweet)
+        self.assertNotIn(tweets[5].retweetedTweet.id, ids)
+        self.assertGreater(tweets[0].date, tweets[1].date)
+
+
+class RunBenchmarkTest(TransactionTestCase):
+    def test_run_benchmark(self):
+        for name in ["record_tweet", "scrape_user_tweets", "scrape_tweet_replies"]:
+            result = run_benchmark(name, 12)
+            self.assertGreater(result["tweets_per_sec"], 0)
+            self.assertGreater(result["queries_per_tweet"], 0)
+
+        reply = Tweet.objects.get(twitter_id=str(FIRST_TWEET_ID + 2))
+        self.assertEqual(reply.in_reply_to_tweet.twitter_id, str(FIRST_TWEET_ID + 1))
+
+    def test_find_regressions(self):
+        baseline = {
+            "record_tweet:1000": {
+                "tweets_per_sec": 100,
+                "queries_per_tweet": 10,
+                "peak_rss_mb": 200,
+            },
+        }
+        results = {
+            "record_tweet:1000": {
+                "tweets_per_sec": 85,
+                "queries_per_tweet": 11.5,
+                "peak_rss_mb": 230,
+            },
+            "record_tweet:10000": {
+                "tweets_per_sec": 1,
+                "queries_per_tweet": 100,
+                "peak_rss_mb": 1000,
+            },
+        }
+        self.assertEqual(find_regressions(results, baseline, 0.2), [])
+        self.assertEqual(len(find_regressions(results, baseline, 0.1)), 3)
+
+    def test_missing_baseline(self):
+        with self.assertRaisesRegex(CommandError, "--save-baseline"):
+            call_command("benchmark_ingestion", baseline="/nonexistent/baseline.json")
@@ -0,0 +1,125 @@
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from pathlib import Path
+from snscrape.modules.twitter import (
+    TwitterProfileScraper,
+    TwitterTweetScraper,
+    TwitterTweetScraperMode,
+)
+from unittest.mock import ANY, patch
+import tempfile
+
+from tweets.cassettes import cassette_name, get_items, record, replay
+from tweets.ingestion import ScraperPrefetcher
+from tweets.models import ScrapingRequest, Tweet
+from tweets.tasks import scrape_user_tweets
+from tweets.tweet_samples import (
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tombstone,
+    tweet_with_quoted_tweet,
+    tweet_with_retweet,
+    user_tweet_1,
+    user_tweet_2,
+    user_tweet_3,
+)
+
+SAMPLE_TWEETS = [
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_quoted_tombstone,
+    tweet_with_retweet,
+]
+
+
+class CassetteTest(SimpleTestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / "cassette.jsonl.gz"
+
+    def test_record_and_replay(self):
+        self.assertEqual(list(record(iter(SAMPLE_TWEETS), self.path)), SAMPLE_TWEETS)
+        self.assertEqual(list(replay(self.path, speed=0)), SAMPLE_TWEETS)
+
+    def test_record_stopped_early(self):
+        for queue_size in [None, 10]:
+            with self.subTest(queue_size=queue_size):
+                items = ScraperPrefetcher(
+                    record(iter(SAMPLE_TWEETS), self.path), queue_size
+                )
+                self.assertEqual(next(items), SAMPLE_TWEETS[0])
+                items.close()
+                if items.thread:
+                    items.thread.join(timeout=1)
+
+                replayed = list(replay(self.path, speed=0))
+                self.assertEqual(replayed, SAMPLE_TWEETS[: len(replayed)])
+                self.assertGreaterEqual(len(replayed), 1)
+
+    @patch("tweets.cassettes.time.sleep")
+    @patch("tweets.cassettes.time.monotonic")
+    def test_replay_speed(self, monotonic_mock, sleep_mock):
+        monotonic_mock.side_effect = [0, 0, 10, 30]
+        list(record(iter(SAMPLE_TWEETS[:3]), self.path))
+
+        monotonic_mock.side_effect = [100, 100, 100, 101]
+        list(replay(self.path, speed=2))
+        self.assertEqual([call.args[0] for call in sleep_mock.call_args_list], [5, 14])
+
+        sleep_mock.reset_mock()
+        monotonic_mock.side_effect = None
+        list(replay(self.path, speed=0))
+        sleep_mock.assert_not_called()
+
+    def test_cassette_name(self):
+        self.assertEqual(
+            cassette_name(
+                TwitterTweetScraper(123, mode=TwitterTweetScraperMode.SCROLL)
+            ),
+            "twittertweetscraper-123-scroll.jsonl.gz",
+        )
+        self.assertNotEqual(
+            cassette_name(TwitterProfileScraper("user1")),
+            cassette_name(TwitterProfileScraper("user2")),
+        )
+
+
+class ReplayScrapingTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cassette_path = tmp_dir.name
+        self.req = ScrapingRequest.objects.create(
+            username="GergelyOrosz",
+            include_replies=False,
+            since=timezone.datetime(2022, 1, 1, tzinfo=timezone.utc),
+            until=timezone.datetime(2024, 1, 1, tzinfo=timezone.utc),
+        )
+
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_from_cassette(self, start_next_scraping_request_mock):
+        user_tweets = [user_tweet_1, user_tweet_2, user_tweet_3]
+        with patch(
+            "snscrape.modules.twitter.TwitterProfileScraper.get_items",
+            return_value=iter(user_tweets),
+        ):
+            scraper = TwitterProfileScraper("GergelyOrosz")
+            with self.settings(SCRAPER_CASSETTE_PATH=self.cassette_path):
+                items = get_items(scraper, mode="record")
+                self.assertEqual(list(items), user_tweets)
+
+        with self.settings(
+            SCRAPER_CASSETTE_MODE="replay",
+            SCRAPER_CASSETTE_PATH=self.cassette_path,
+            SCRAPER_REPLAY_SPEED=0,
+        ):
+            results = scrape_user_tweets(self.req.id)
+
+        self.assertEqual(
+            {"created_tweets": 3, "updated_tweets": 0, "timings": ANY}, results
+        )
+        self.assertEqual(Tweet.objects.filter(scraping_request=self.req).count(), 3)
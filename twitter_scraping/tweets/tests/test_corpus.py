@@ -0,0 +1,97 @@
+from django.db.models import Count, F
+from django.test import TestCase
+from django.utils import timezone
+
+from tweets.corpus import CONTENT_MAX_LENGTH, WORDS, content, generate_corpus
+from tweets.models import Tweet, TwitterUser
+from tweets.values import TOTAL_POLITICIANS
+
+tz = timezone.get_default_timezone()
+
+
+class GenerateCorpusTest(TestCase):
+    def setUp(self):
+        self.user = TwitterUser.objects.create(
+            twitter_id="999",
+            username="random_username",
+            display_name="Random User",
+            description="Just another user",
+            account_created_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+        )
+        self.tweet = Tweet.objects.create(
+            twitter_id="111",
+            content="test tweet",
+            published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+            user=self.user,
+        )
+
+    def test_generate_corpus(self):
+        copied = generate_corpus(
+            2000,
+            users=50,
+            fanout=20,
+            max_conversation_size=300,
+            batch_size=300,
+            seed=1,
+        )
+
+        self.assertEqual(copied, {"users": len(TOTAL_POLITICIANS) + 50, "tweets": 2000})
+        corpus = Tweet.objects.exclude(id=self.tweet.id)
+        self.assertEqual(corpus.count(), 2000)
+        self.assertGreater(corpus.order_by("id").first().id, self.tweet.id)
+
+        replies = corpus.filter(in_reply_to_tweet__isnull=False)
+        self.assertTrue(
+            replies.filter(in_reply_to_tweet__in_reply_to_tweet__isnull=False).exists()
+        )
+        self.assertTrue(corpus.filter(retweeted_tweet__isnull=False).exists())
+        self.assertTrue(corpus.filter(quoted_tweet__isnull=False).exists())
+        self.assertFalse(
+            replies.exclude(in_reply_to_id=F("in_reply_to_tweet__twitter_id")).exists()
+        )
+        self.assertFalse(
+            replies.exclude(
+                conversation_tweet__user__username__in=TOTAL_POLITICIANS
+            ).exists()
+        )
+        self.assertFalse(replies.filter(user__username__in=TOTAL_POLITICIANS).exists())
+
+        root = (
+            corpus.annotate(replies=Count("tweet_replies_set"))
+            .filter(replies__gt=0)
+            .first()
+        )
+        self.assertEqual(root.reply_count, root.replies)
+
+        # Rows created afterwards get ids past the copied ones
+        last_id = corpus.order_by("-id").first().id
+        tweet = Tweet.objects.create(
+            twitter_id="112",
+            content="test tweet",
+            published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+            user=self.user,
+        )
+        self.assertGreater(tweet.id, last_id)
+
+    def test_seed(self):
+        corpus = Tweet.objects.exclude(id=self.tweet.id).order_by("id")
+        generate_corpus(100, users=10, seed=1)
+        first = list(corpus.values_list("content", "user__username"))
+        corpus.delete()
+        generate_corpus(100, users=10, seed=1)
+        second = list(corpus.values_list("content", "user__username"))
+        self.assertEqual(first, second)
+
+    def test_longest_content(self):
+        class LongestRandom:
+            """Draws the most words, all of them the longest one"""
+
+            def randint(self, a, b):
+                return b
+
+            def choices(self, population, k):
+                return [max(population, key=len)] * k
+
+        text = content(LongestRandom())
+        self.assertLessEqual(len(text), CONTENT_MAX_LENGTH)
+        self.assertEqual(set(text.split(" ")), {max(WORDS, key=len)})
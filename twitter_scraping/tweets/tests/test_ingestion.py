@@ -0,0 +1,202 @@
+from copy import deepcopy
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.serializers import ValidationError
+from unittest.mock import patch
+
+from tweets.ingestion import ScraperPrefetcher, TweetBatchWriter
+from tweets.models import Tweet, TwitterUser, ScrapingRequest
+from tweets.tests.fixtures import tweet1_incomplete
+from tweets.tweet_samples import (
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_quoted_tombstone,
+    tweet_with_retweet,
+)
+
+tz = timezone.get_default_timezone()
+
+
+class TweetBatchWriterTest(TestCase):
+    def setUp(self):
+        self.req = ScrapingRequest.objects.create(
+            username="GergelyOrosz",
+            since=timezone.datetime(2022, 1, 1, tzinfo=tz),
+            until=timezone.datetime(2024, 1, 1, tzinfo=tz),
+        )
+
+    def test_flush_creates_tweets_and_users(self):
+        writer = TweetBatchWriter(self.req.id, batch_size=10)
+        for tweet in [normal_tweet, tweet_in_reply_to, tweet_replying_another_reply]:
+            writer.add(tweet)
+        self.assertEqual(Tweet.objects.count(), 0)
+
+        created_ids, updated_ids = writer.flush()
+
+        self.assertEqual(
+            created_ids,
+            [
+                str(normal_tweet.id),
+                str(tweet_in_reply_to.id),
+                str(tweet_replying_another_reply.id),
+            ],
+        )
+        self.assertEqual(updated_ids, [])
+        self.assertEqual(Tweet.objects.filter(scraping_request=self.req).count(), 3)
+        self.assertEqual(
+            TwitterUser.objects.get(twitter_id=str(normal_tweet.user.id)).username,
+            normal_tweet.user.username,
+        )
+
+        reply = Tweet.objects.get(twitter_id=str(tweet_replying_another_reply.id))
+        self.assertEqual(reply.in_reply_to_tweet.twitter_id, str(tweet_in_reply_to.id))
+        self.assertEqual(reply.conversation_tweet.twitter_id, str(normal_tweet.id))
+
+    def test_flush_updates_existing_tweets(self):
+        with TweetBatchWriter(self.req.id) as writer:
+            writer.add(normal_tweet)
+
+        updated_tweet = deepcopy(normal_tweet)
+        updated_tweet.likeCount += 10
+        with TweetBatchWriter(self.req.id) as writer:
+            writer.add(updated_tweet)
+
+        self.assertEqual(writer.created_ids, [])
+        self.assertEqual(writer.updated_ids, [str(normal_tweet.id)])
+        tweet = Tweet.objects.get(twitter_id=str(normal_tweet.id))
+        self.assertEqual(tweet.like_count, updated_tweet.likeCount)
+
+    def test_flush_when_batch_is_full(self):
+        writer = TweetBatchWriter(self.req.id, batch_size=2)
+        writer.add(normal_tweet)
+        writer.add(tweet_in_reply_to)
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(Tweet.objects.count(), 2)
+
+    def test_flush_query_count_doesnt_grow_with_batch(self):
+        writer = TweetBatchWriter(self.req.id)
+        for tweet in [normal_tweet, tweet_in_reply_to, tweet_replying_another_reply]:
+            writer.add(tweet)
+        with self.assertNumQueries(14):
+            writer.flush()
+
+    def test_unchanged_users_arent_written_again(self):
+        writer = TweetBatchWriter(self.req.id)
+        writer.add(normal_tweet)
+        writer.flush()
+        user = TwitterUser.objects.get(twitter_id=str(normal_tweet.user.id))
+
+        updated_tweet = deepcopy(normal_tweet)
+        updated_tweet.likeCount += 10
+        writer.add(updated_tweet)
+        with patch("tweets.ingestion.TwitterUser.objects.bulk_create") as bulk_create:
+            writer.flush()
+            bulk_create.assert_not_called()
+        self.assertEqual(writer.user_cache.hits, 1)
+        self.assertEqual(Tweet.objects.get(twitter_id=str(normal_tweet.id)).user, user)
+
+    def test_changed_users_are_written(self):
+        writer = TweetBatchWriter(self.req.id)
+        writer.add(normal_tweet)
+        writer.flush()
+
+        updated_tweet = deepcopy(normal_tweet)
+        updated_tweet.user.followersCount += 1
+        writer.add(updated_tweet)
+        writer.flush()
+
+        user = TwitterUser.objects.get(twitter_id=str(normal_tweet.user.id))
+        self.assertEqual(user.followers_count, updated_tweet.user.followersCount)
+        self.assertEqual(writer.user_cache.hits, 0)
+
+    def test_related_tweets(self):
+        with TweetBatchWriter(self.req.id) as writer:
+            writer.add(tweet_with_quoted_tweet)
+            writer.add(tweet_with_quoted_tombstone)
+            writer.add(tweet_with_retweet)
+
+        self.assertEqual(len(writer.created_ids), 3)
+
+        tweet = Tweet.objects.get(twitter_id=str(tweet_with_quoted_tweet.id))
+        self.assertEqual(tweet.quoted_id, str(tweet_with_quoted_tweet.quotedTweet.id))
+        self.assertEqual(tweet.quoted_tweet.scraping_request, None)
+
+        tweet = Tweet.objects.get(twitter_id=str(tweet_with_quoted_tombstone.id))
+        self.assertEqual(
+            tweet.quoted_id, str(tweet_with_quoted_tombstone.quotedTweet.id)
+        )
+        self.assertEqual(tweet.quoted_tweet, None)
+
+        tweet = Tweet.objects.get(twitter_id=str(tweet_with_retweet.id))
+        self.assertEqual(
+            tweet.retweeted_tweet.twitter_id,
+            str(tweet_with_retweet.retweetedTweet.id),
+        )
+
+    def test_invalid_tweet(self):
+        writer = TweetBatchWriter(self.req.id)
+        with self.assertRaises(ValidationError):
+            writer.add(deepcopy(tweet1_incomplete))
+        self.assertEqual(len(writer), 0)
+
+
+class ScraperPrefetcherTest(SimpleTestCase):
+    databases = {"default"}
+
+    def test_items_in_order(self):
+        items = ScraperPrefetcher(iter(range(100)), queue_size=10)
+        self.assertEqual(list(items), list(range(100)))
+        self.assertEqual(list(items), [])
+
+    def test_without_queue(self):
+        items = ScraperPrefetcher(iter(range(10)))
+        self.assertEqual(items.thread, None)
+        self.assertEqual(list(items), list(range(10)))
+
+    def test_scraper_exception(self):
+        def scraper():
+            yield 1
+            raise ValueError("blocked")
+
+        items = ScraperPrefetcher(scraper(), queue_size=10)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+        with self.assertRaises(StopIteration):
+            next(items)
+
+    def test_backpressure_and_close(self):
+        fetched = []
+
+        def scraper():
+            for i in range(1000):
+                fetched.append(i)
+                yield i
+
+        items = ScraperPrefetcher(scraper(), queue_size=5)
+        self.assertEqual(next(items), 0)
+        items.thread.join(timeout=0.5)
+        self.assertLessEqual(len(fetched), 8)
+
+        items.close()
+        self.assertFalse(items.thread.is_alive())
+        self.assertLess(len(fetched), 1000)
+
+    def test_closes_thread_connections(self):
+        thread_connections = []
+
+        def scraper():
+            # Like the shared rate limit, which runs queries in the producer thread
+            connection = connections["default"]
+            connection.ensure_connection()
+            thread_connections.append(connection)
+            yield 1
+
+        items = ScraperPrefetcher(scraper(), queue_size=10)
+        self.assertEqual(list(items), [1])
+        items.thread.join(timeout=1)
+        self.assertIsNot(thread_connections[0], connections["default"])
+        self.assertIsNone(thread_connections[0].connection)
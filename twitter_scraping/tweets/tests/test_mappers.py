@@ -0,0 +1,94 @@
+from copy import deepcopy
+from django.test import SimpleTestCase
+from rest_framework.serializers import ValidationError
+
+from tweets.mappers import map_tweet, map_user
+from tweets.serializers import SnscrapeTweetSerializer
+from tweets.tests.fixtures import (
+    tweet1,
+    tweet1_incomplete,
+    user1_incomplete,
+)
+from tweets.tweet_samples import (
+    normal_tweet,
+    tweet_in_reply_to,
+    tweet_replying_another_reply,
+    tweet_with_quoted_tweet,
+    tweet_with_quoted_tombstone,
+    tweet_with_retweet,
+    user_tweet_1,
+    user_tweet_2,
+    user_tweet_3,
+)
+
+
+class MapTweetTest(SimpleTestCase):
+    def test_same_fields_as_serializer(self):
+        for scraped_tweet in [
+            tweet1,
+            normal_tweet,
+            tweet_in_reply_to,
+            tweet_replying_another_reply,
+            tweet_with_quoted_tweet,
+            tweet_with_quoted_tombstone,
+            tweet_with_retweet,
+            user_tweet_1,
+            user_tweet_2,
+            user_tweet_3,
+        ]:
+            serializer = SnscrapeTweetSerializer(data=deepcopy(scraped_tweet))
+            self.assertTrue(serializer.is_valid())
+            validated_data = dict(serializer.validated_data)
+            validated_data["user"] = dict(validated_data["user"])
+
+            self.assertEqual(map_tweet(scraped_tweet), validated_data)
+
+    def test_doesnt_modify_scraped_tweet(self):
+        scraped_tweet = deepcopy(tweet1)
+        map_tweet(scraped_tweet)
+        self.assertEqual(scraped_tweet, tweet1)
+
+    def test_incomplete_tweet(self):
+        with self.assertRaises(ValidationError) as cm:
+            map_tweet(tweet1_incomplete)
+        self.assertEqual(
+            set(cm.exception.detail),
+            {"id", "rawContent", "replyCount", "conversationId"},
+        )
+
+    def test_incomplete_user(self):
+        with self.assertRaises(ValidationError) as cm:
+            map_user(user1_incomplete)
+        self.assertEqual(set(cm.exception.detail), {"username", "followersCount"})
+
+        scraped_tweet = deepcopy(tweet1)
+        scraped_tweet.user = user1_incomplete
+        with self.assertRaises(ValidationError) as cm:
+            map_tweet(scraped_tweet)
+        self.assertEqual(set(cm.exception.detail), {"user"})
+
+    def test_invalid_values(self):
+        for attr, value in [
+            ("rawContent", "   "),
+            ("rawContent", "x" * 301),
+            ("replyCount", "many"),
+            ("replyCount", None),
+            ("date", "yesterday"),
+        ]:
+            scraped_tweet = deepcopy(tweet1)
+            setattr(scraped_tweet, attr, value)
+            with self.assertRaises(ValidationError) as cm:
+                map_tweet(scraped_tweet)
+            self.assertEqual(set(cm.exception.detail), {attr})
+
+    def test_coerced_values(self):
+        scraped_tweet = deepcopy(tweet1)
+        scraped_tweet.replyCount = "22"
+        scraped_tweet.viewCount = None
+        scraped_tweet.user.location = None
+
+        values = map_tweet(scraped_tweet)
+        self.assertEqual(values["reply_count"], 22)
+        self.assertEqual(values["view_count"], None)
+        self.assertEqual(values["user"]["location"], "")
+        self.assertEqual(values["twitter_id"], str(tweet1.id))
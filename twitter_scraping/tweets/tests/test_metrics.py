@@ -0,0 +1,117 @@
+from django.db import connection
+from django.test import TestCase
+from prometheus_client import REGISTRY
+from unittest.mock import Mock
+
+from tweets.ingestion import TweetBatchWriter
+from tweets.models import ScrapingRequest
+from tweets.ratelimit import rate_limited
+from tweets.tasks import resolve_related_tweets
+from tweets.tweet_samples import normal_tweet, tweet_in_reply_to
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsViewTest(TestCase):
+    def test_metrics(self):
+        ScrapingRequest.objects.create(username="user1")
+        ScrapingRequest.objects.create(username="user2", status="finished")
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('scraping_requests{status="created"} 1.0', content)
+        self.assertIn('scraping_requests{status="finished"} 1.0', content)
+        self.assertIn('scraping_requests{status="interrupted"} 0.0', content)
+        self.assertIn("db_query_seconds_bucket", content)
+
+
+class IngestionMetricsTest(TestCase):
+    def test_tweets_ingested(self):
+        created = sample("tweets_ingested_total", result="created")
+        updated = sample("tweets_ingested_total", result="updated")
+
+        with TweetBatchWriter() as writer:
+            writer.add(normal_tweet)
+            writer.add(tweet_in_reply_to)
+        with TweetBatchWriter() as writer:
+            writer.add(normal_tweet)
+
+        self.assertEqual(sample("tweets_ingested_total", result="created"), created + 2)
+        self.assertEqual(sample("tweets_ingested_total", result="updated"), updated + 1)
+
+    def test_db_queries(self):
+        selects = sample("db_query_seconds_count", operation="SELECT")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertEqual(
+            sample("db_query_seconds_count", operation="SELECT"), selects + 1
+        )
+
+    def test_task_duration(self):
+        count = sample(
+            "celery_task_seconds_count",
+            task="tweets.tasks.resolve_related_tweets",
+            state="SUCCESS",
+        )
+        resolve_related_tweets.apply()
+        self.assertEqual(
+            sample(
+                "celery_task_seconds_count",
+                task="tweets.tasks.resolve_related_tweets",
+                state="SUCCESS",
+            ),
+            count + 1,
+        )
+
+
+class ScraperMetricsTest(TestCase):
+    def setUp(self):
+        self.scraper = Mock()
+        self.responses = []
+        send = self.scraper._session.send
+
+        def request(method, url, responseOkCallback=None, **kwargs):
+            for response in self.responses:
+                send.return_value = response
+                result = responseOkCallback(self.scraper._session.send())
+                if result[0]:
+                    return result
+            raise Exception("Retries exhausted")
+
+        self.scraper._request.side_effect = request
+        rate_limited(self.scraper, Mock())
+
+    def _samples(self):
+        return [
+            sample("scraper_responses_total", outcome="ok"),
+            sample("scraper_responses_total", outcome="throttled"),
+            sample("scraper_responses_total", outcome="rejected"),
+            sample("scraper_failed_pages_total"),
+            sample("scraper_response_seconds_count"),
+        ]
+
+    def test_responses(self):
+        before = self._samples()
+        self.responses = [Mock(status_code=429), Mock(status_code=200)]
+        self.scraper._request(
+            "GET",
+            "url",
+            responseOkCallback=lambda r: (r.status_code == 200, "blocked"),
+        )
+
+        after = self._samples()
+        self.assertEqual([a - b for a, b in zip(after, before)], [1, 1, 0, 0, 2])
+
+    def test_failed_page(self):
+        before = self._samples()
+        self.responses = [Mock(status_code=500)]
+        callback = Mock(return_value=(False, "error"))
+        with self.assertRaises(Exception):
+            self.scraper._request("GET", "url", responseOkCallback=callback)
+
+        after = self._samples()
+        self.assertEqual([a - b for a, b in zip(after, before)], [0, 0, 1, 1, 1])
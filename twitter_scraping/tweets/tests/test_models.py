@@ -1,10 +1,14 @@
 from copy import deepcopy
+from django.contrib.admin.sites import site
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from tweets.models import Tweet, TwitterUser, ScrapingRequest
 from tweets.tasks import record_tweet
-from tweets.tests.tweet_samples import (
+from tweets.tweet_samples import (
+    normal_tweet,
     user_tweet_1,
     user_tweet_2,
     user_tweet_3,
@@ -83,6 +87,29 @@ class TweetModelTests(TestCase):
         self.tweet3.get_conversation_tweet()
         self.assertEqual(self.tweet3.conversation_tweet, None)
 
+    def test_resolve_related_tweets(self):
+        resolved = Tweet.objects.resolve_related_tweets()
+        self.assertEqual(resolved["in_reply_to_tweet"], 2)
+        self.assertEqual(resolved["conversation_tweet"], 2)
+
+        self.tweet2.refresh_from_db()
+        self.tweet3.refresh_from_db()
+        self.tweet4.refresh_from_db()
+        self.assertEqual(self.tweet2.in_reply_to_tweet, self.tweet1)
+        self.assertEqual(self.tweet2.conversation_tweet, self.tweet1)
+        self.assertEqual(self.tweet3.in_reply_to_tweet, None)
+        self.assertEqual(self.tweet4.in_reply_to_tweet, self.tweet2)
+        self.assertEqual(self.tweet4.conversation_tweet, self.tweet1)
+
+    def test_resolve_related_tweets_by_twitter_ids(self):
+        Tweet.objects.resolve_related_tweets(twitter_ids=["112"])
+
+        self.tweet2.refresh_from_db()
+        self.tweet4.refresh_from_db()
+        self.assertEqual(self.tweet2.in_reply_to_tweet, self.tweet1)
+        self.assertEqual(self.tweet4.in_reply_to_tweet, self.tweet2)
+        self.assertEqual(self.tweet4.conversation_tweet, None)
+
 
 class TweetManagerTestCase(TestCase):
     def setUp(self):
@@ -155,6 +182,69 @@ class ScrapingRequestModelTest(TestCase):
         reset_mock.assert_called()
         scrape_user_tweets_mock.assert_called_with(req_id=self.req.id)
 
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch("tweets.tasks.scrape_user_tweets.delay")
+    def test_create_scraping_task_on_interrupted_req(self, scrape_user_tweets_mock):
+        self.req.save_checkpoint(["1", "2"], ["3"], "3")
+        self.req.interrupt()
+        self.req.create_scraping_task()
+
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "created")
+        self.assertEqual(self.req.checkpoint_tweet_id, "3")
+        self.assertEqual(self.req.created_tweets_count, 2)
+        scrape_user_tweets_mock.assert_called_with(req_id=self.req.id)
+
+    def test_save_checkpoint(self):
+        self.req.save_checkpoint(["1", "2"], [], "2")
+        self.req.save_checkpoint(["3"], ["4"], "4")
+
+        req = ScrapingRequest.objects.get(id=self.req.id)
+        self.assertEqual(req.checkpoint_tweet_id, "4")
+        self.assertEqual(req.created_tweets_count, 3)
+        self.assertEqual(req.updated_tweets_count, 1)
+        self.assertEqual(self.req.created_tweets_count, 3)
+
+        req.finish()
+        req.reset()
+        req.refresh_from_db()
+        self.assertFalse(req.has_checkpoint())
+        self.assertEqual(req.created_tweets_count, 0)
+
+    def test_log_doesnt_rewrite_request(self):
+        self.req.logs = "legacy log\n"
+        self.req.save()
+
+        with self.assertNumQueries(1):
+            self.req.log("first message")
+        with self.assertNumQueries(1):
+            self.req.log_counts(tweets=10, created_tweets=4)
+        self.req.log_counts(created_tweets=1)
+
+        req = ScrapingRequest.objects.get(id=self.req.id)
+        self.assertEqual(req.logs, "legacy log\n")
+        self.assertEqual(req.events.count(), 4)
+        self.assertEqual(req.get_counts(), {"tweets": 10, "created_tweets": 5})
+        self.assertEqual(
+            req.get_logs(),
+            "legacy log\nfirst message\ntweets=10\ncreated_tweets=4\ncreated_tweets=1",
+        )
+
+    def test_counts_since_reset(self):
+        self.req.log_counts(tweets=10, created_tweets=4)
+        self.req.finish()
+        self.req.reset()
+        self.assertEqual(self.req.get_counts(), {})
+
+        self.req.log_counts(tweets=3, created_tweets=1)
+        # Resuming from a checkpoint continues the same attempt
+        self.req.interrupt()
+        self.req.reset(keep_checkpoint=True)
+        self.req.log_counts(tweets=2)
+
+        self.assertEqual(self.req.get_counts(), {"tweets": 5, "created_tweets": 1})
+        self.assertIn("created_tweets=4\nReiniciado\ntweets=3", self.req.get_logs())
+
     def test_create_conversation_scraping_requests(self):
         record_tweet(user_tweet_1, self.req.id)
         record_tweet(user_tweet_2, self.req.id)
@@ -184,6 +274,68 @@ class ScrapingRequestModelTest(TestCase):
         self.assertEqual(requests.count(), 1)
         self.assertEqual(requests[0].twitter_id, str(user_tweet_1.id))
 
+    def test_create_conversation_scraping_requests_query_count(self):
+        record_tweet(user_tweet_1, self.req.id)
+        record_tweet(normal_tweet, self.req.id)
+
+        with self.assertNumQueries(5):
+            reqs = self.req.create_conversation_scraping_requests()
+
+        self.assertEqual(
+            [req.twitter_id for req in reqs],
+            [str(user_tweet_1.id), str(normal_tweet.id)],
+        )
+        self.assertEqual(reqs[0].parent, self.req)
+
+    def test_pending_conversation_scraping_requests_are_unique(self):
+        values = dict(
+            username=self.req.username,
+            twitter_id=str(user_tweet_1.id),
+            since=self.req.since,
+            until=self.req.until,
+            include_replies=True,
+        )
+        first = ScrapingRequest.objects.create(**values)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ScrapingRequest.objects.create(**values)
+
+        first.interrupt()
+        ScrapingRequest.objects.create(**values)
+
+    @patch("tweets.tasks.scrape_tweet_replies.delay")
+    def test_reset_with_pending_duplicate(self, scrape_tweet_replies_mock):
+        values = dict(
+            username=self.req.username,
+            twitter_id=str(user_tweet_1.id),
+            since=self.req.since,
+            until=self.req.until,
+            include_replies=True,
+        )
+        interrupted = ScrapingRequest.objects.create(**values)
+        interrupted.interrupt()
+        pending = ScrapingRequest.objects.create(**values)
+
+        with self.assertRaisesRegex(ValidationError, f"request {pending.id}"):
+            interrupted.reset()
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, "interrupted")
+
+        # The admin action reports it instead of failing
+        model_admin = site._registry[ScrapingRequest]
+        with patch.object(model_admin, "message_user") as message_user:
+            model_admin.start_scraping(
+                None,
+                ScrapingRequest.objects.filter(id__in=[interrupted.id, pending.id]),
+            )
+        message_user.assert_called_once()
+        scrape_tweet_replies_mock.assert_called_once_with(
+            tweet_id=pending.twitter_id, req_id=pending.id
+        )
+
+        pending.finish()
+        interrupted.reset()
+        self.assertEqual(interrupted.status, "created")
+
     def test_create_conversation_scraping_requests_duplicate_interrupted(self):
         record_tweet(user_tweet_1, self.req.id)
         record_tweet(user_tweet_2, self.req.id)
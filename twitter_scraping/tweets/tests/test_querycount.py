@@ -0,0 +1,149 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from unittest.mock import patch
+
+from tweets.models import ScrapingRequest, Tweet, TwitterUser
+from tweets.querycount import QueryCounter, fingerprint
+from tweets.tasks import resolve_related_tweets
+from tweets.tests.helpers import QueryBudgetMixin
+
+tz = timezone.get_default_timezone()
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint(
+                'SELECT "id" FROM "tweets_tweet"\n  WHERE "twitter_id" IN (%s, %s, %s) AND "like_count" > 10'
+            ),
+            'SELECT "id" FROM "tweets_tweet" WHERE "twitter_id" IN (...) AND "like_count" > ?',
+        )
+        self.assertEqual(
+            fingerprint("SELECT 1 WHERE name = 'it''s'"),
+            "SELECT ? WHERE name = ?",
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "tweets_tweet" WHERE "id" IN (%s)'),
+            fingerprint('SELECT * FROM "tweets_tweet" WHERE "id" IN (%s, %s)'),
+        )
+
+
+class QueryCounterTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = TwitterUser.objects.create(
+            twitter_id="999",
+            username="random_username",
+            display_name="Random User",
+            description="Just another user",
+            account_created_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+        )
+        for twitter_id in ["111", "112", "113"]:
+            Tweet.objects.create(
+                twitter_id=twitter_id,
+                content="test tweet",
+                published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+                in_reply_to_id="111",
+                conversation_id="111",
+                user=self.user,
+            )
+
+    def test_duplicates(self):
+        with QueryCounter() as counter:
+            for tweet in Tweet.objects.all():
+                tweet.user.username
+        self.assertEqual(counter.count, 4)
+        self.assertEqual(list(counter.duplicates().values()), [3])
+
+        # Queries after the block aren't counted
+        TwitterUser.objects.count()
+        self.assertEqual(counter.count, 4)
+
+    def test_query_budget(self):
+        with self.assertRaisesRegex(AssertionError, "over the budget of 2"):
+            with self.assertQueryBudget(2):
+                for tweet in Tweet.objects.all():
+                    tweet.user.username
+        with self.assertRaisesRegex(AssertionError, "repeated more than 1 times"):
+            with self.assertQueryBudget(10, max_repeats=1):
+                for tweet in Tweet.objects.all():
+                    tweet.user.username
+        with self.assertQueryBudget(1, max_repeats=1):
+            list(Tweet.objects.select_related("user"))
+
+    def test_fetch_related_tweets(self):
+        tweet = Tweet.objects.get(twitter_id="113")
+        with self.assertQueryBudget(2):
+            tweet.fetch_related_tweets()
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.in_reply_to_tweet.twitter_id, "111")
+        self.assertEqual(tweet.conversation_tweet.twitter_id, "111")
+
+        with self.assertQueryBudget(0):
+            tweet.fetch_related_tweets()
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_report(self):
+        with QueryCounter() as counter:
+            for tweet in Tweet.objects.all():
+                tweet.user.username
+        with patch("tweets.querycount.logger") as logger:
+            counter.report("test")
+        self.assertEqual(logger.warning.call_count, 2)
+        self.assertIn("repetida 3 vezes", logger.warning.call_args.args[0])
+
+    def test_task_report(self):
+        with patch("tweets.querycount.QueryCounter.report") as report:
+            resolve_related_tweets.apply()
+        report.assert_called_once()
+        self.assertIn("tweets.tasks.resolve_related_tweets", report.call_args.args[0])
+
+
+class AdminQueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "password")
+        )
+        user = TwitterUser.objects.create(
+            twitter_id="999",
+            username="random_username",
+            display_name="Random User",
+            description="Just another user",
+            account_created_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+        )
+        root = Tweet.objects.create(
+            twitter_id="100",
+            content="root tweet",
+            published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+            user=user,
+        )
+        for i in range(10):
+            req = ScrapingRequest.objects.create(
+                username="random_username",
+                twitter_id=str(100 + i),
+                include_replies=True,
+            )
+            Tweet.objects.create(
+                twitter_id=str(200 + i),
+                content="reply",
+                published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+                in_reply_to_id="100",
+                in_reply_to_tweet=root,
+                conversation_id="100",
+                conversation_tweet=root,
+                user=user,
+                scraping_request=req,
+            )
+
+    def test_tweet_changelist(self):
+        with self.assertQueryBudget(10, max_repeats=2):
+            response = self.client.get("/admin/tweets/tweet/")
+        self.assertContains(response, "random_username")
+
+    def test_scraping_request_changelist(self):
+        with self.assertQueryBudget(10, max_repeats=2):
+            response = self.client.get("/admin/tweets/scrapingrequest/")
+        self.assertContains(
+            response, "<a href='https://twitter.com/random_username/status/100'>100</a>"
+        )
+        self.assertTrue(response.has_header("X-Query-Count"))
@@ -0,0 +1,129 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+import requests
+from unittest.mock import Mock, patch
+
+from tweets.models import ScrapingRateLimit
+from tweets.ratelimit import TokenBucket, rate_limited
+
+
+@override_settings(
+    SCRAPING_RATE_LIMIT=2, SCRAPING_RATE_BURST=3, SCRAPING_RATE_RECOVERY_SECONDS=100
+)
+@patch("tweets.ratelimit.time.sleep")
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        self.bucket = TokenBucket("test")
+
+    def _state(self):
+        return ScrapingRateLimit.objects.get(name="test")
+
+    def _go_back(self, seconds):
+        ScrapingRateLimit.objects.filter(name="test").update(
+            refilled_at=timezone.now() - timezone.timedelta(seconds=seconds)
+        )
+
+    def test_burst_then_wait(self, sleep_mock):
+        for _ in range(3):
+            self.assertEqual(self.bucket.acquire(), 0)
+        sleep_mock.assert_not_called()
+
+        waited = self.bucket.acquire()
+        self.assertAlmostEqual(waited, 0.5, delta=0.05)
+        sleep_mock.assert_called_once_with(waited)
+
+        # The next worker reserves the token after that one
+        self.assertAlmostEqual(self.bucket.acquire(), 1, delta=0.05)
+
+    def test_refill(self, sleep_mock):
+        for _ in range(3):
+            self.bucket.acquire()
+        self._go_back(10)
+
+        self.assertEqual(self.bucket.acquire(), 0)
+        self.assertAlmostEqual(self._state().tokens, 2, delta=0.05)
+
+    def test_penalize_slows_down_and_recovers(self, sleep_mock):
+        self.bucket.acquire()
+        self.bucket.penalize()
+        self.bucket.penalize()
+
+        state = self._state()
+        self.assertAlmostEqual(state.rate, 0.5, delta=0.05)
+        self.assertLessEqual(state.tokens, 0)
+        self.assertAlmostEqual(self.bucket.acquire(), 2, delta=0.1)
+
+        self._go_back(30)
+        self.bucket.acquire()
+        self.assertAlmostEqual(self._state().rate, 1.1, delta=0.05)
+
+    def test_rate_has_a_minimum(self, sleep_mock):
+        for _ in range(10):
+            self.bucket.penalize()
+        self.assertAlmostEqual(self._state().rate, 2 / 64, delta=0.005)
+
+    @override_settings(SCRAPING_RATE_LIMIT=0)
+    def test_disabled(self, sleep_mock):
+        for _ in range(10):
+            self.assertEqual(self.bucket.acquire(), 0)
+        self.bucket.penalize()
+        self.assertFalse(ScrapingRateLimit.objects.exists())
+
+
+class RateLimitedTest(TestCase):
+    def setUp(self):
+        self.bucket = Mock()
+        self.scraper = Mock()
+        # Responses or connection errors of the attempts, in order
+        self.attempts = []
+
+        def send(*args, **kwargs):
+            attempt = self.attempts.pop(0)
+            if isinstance(attempt, Exception):
+                raise attempt
+            return attempt
+
+        def request(method, url, responseOkCallback=None, **kwargs):
+            # The retry loop of snscrape's Scraper._request
+            while self.attempts:
+                try:
+                    response = self.scraper._session.send(Mock())
+                except requests.exceptions.RequestException:
+                    continue
+                result = responseOkCallback(response)
+                if result[0]:
+                    return result
+            raise Exception("Retries exhausted")
+
+        self.scraper._session.send.side_effect = send
+        self.scraper._request.side_effect = request
+        rate_limited(self.scraper, self.bucket)
+
+    def test_takes_a_token_per_request(self):
+        self.attempts = [Mock(status_code=200)]
+        self.assertEqual(self.scraper._request("GET", "url"), (True, None))
+        self.bucket.acquire.assert_called_once()
+        self.bucket.penalize.assert_not_called()
+
+    def test_blocked_request_slows_down_everyone(self):
+        self.attempts = [Mock(status_code=429), Mock(status_code=200)]
+        callback = Mock(side_effect=lambda r: (r.status_code == 200, "blocked"))
+
+        result = self.scraper._request("GET", "url", responseOkCallback=callback)
+
+        self.assertEqual(result, (True, "blocked"))
+        self.bucket.penalize.assert_called_once()
+        self.assertEqual(self.bucket.acquire.call_count, 2)
+
+    def test_every_retry_takes_a_token(self):
+        self.attempts = [
+            requests.exceptions.ConnectionError(),
+            Mock(status_code=500),
+            Mock(status_code=200),
+        ]
+        callback = Mock(side_effect=lambda r: (r.status_code == 200, "error"))
+
+        self.scraper._request("GET", "url", responseOkCallback=callback)
+
+        self.assertEqual(self.bucket.acquire.call_count, 3)
+        self.bucket.penalize.assert_not_called()
@@ -1,9 +1,14 @@
 from copy import deepcopy
 from django.test import TestCase
 from django.utils import timezone
+from unittest.mock import patch
 
 from tweets.models import ScrapingRequest
-from tweets.serializers import SnscrapeTwitterUserSerializer, SnscrapeTweetSerializer
+from tweets.serializers import (
+    SnscrapeTwitterUserSerializer,
+    SnscrapeTweetSerializer,
+    TwitterUserCache,
+)
 from tweets.tests.fixtures import (
     tweet1,
     tweet1_updated_tweet,
@@ -207,3 +212,33 @@ class SnscrapeTweetSerializerTest(TestCase):
         self.assertEqual(user.tweet_count, self.tweet1_updated_both.user.statusesCount)
         self.assertEqual(user.listed_count, self.tweet1_updated_both.user.listedCount)
         self.assertEqual(user.location, self.tweet1_updated_both.user.location)
+
+    def test_user_cache(self):
+        user_cache = TwitterUserCache()
+        serializer = SnscrapeTweetSerializer(
+            data=deepcopy(self.tweet1), context={"user_cache": user_cache}
+        )
+        self.assertTrue(serializer.is_valid())
+        tweet, created = serializer.save()
+        self.assertEqual(len(user_cache), 1)
+
+        serializer = SnscrapeTweetSerializer(
+            data=deepcopy(self.tweet1_updated_tweet), context={"user_cache": user_cache}
+        )
+        self.assertTrue(serializer.is_valid())
+        with patch(
+            "tweets.serializers.TwitterUser.objects.update_or_create"
+        ) as update_or_create_mock:
+            tweet, created = serializer.save()
+            update_or_create_mock.assert_not_called()
+        self.assertEqual(tweet.user.twitter_id, str(self.tweet1.user.id))
+
+        serializer = SnscrapeTweetSerializer(
+            data=deepcopy(self.tweet1_updated_both), context={"user_cache": user_cache}
+        )
+        self.assertTrue(serializer.is_valid())
+        tweet, created = serializer.save()
+        tweet.user.refresh_from_db()
+        self.assertEqual(
+            tweet.user.followers_count, self.tweet1_updated_both.user.followersCount
+        )
@@ -1,14 +1,17 @@
 from copy import deepcopy
+from dataclasses import replace
+from datetime import timedelta
+from django.db import DatabaseError, IntegrityError, connections, transaction
 from django.test import TestCase, override_settings
 from django.utils import timezone
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 
-from tweets.models import Tweet, ScrapingRequest
+from tweets.models import Tweet, ScrapingRequest, SCHEDULER_LOCK_ID
 from tweets.tests.fixtures import (
     tweet1,
     tweet1_incomplete,
 )
-from tweets.tests.tweet_samples import (
+from tweets.tweet_samples import (
     normal_tweet,
     tweet_in_reply_to,
     tweet_replying_another_reply,
@@ -20,13 +23,17 @@ from tweets.tests.tweet_samples import (
     user_tweet_3,
 )
 from tweets.tasks import (
+    create_scraping_requests,
+    finish_conversation_scraping,
     save_scrapped_tweet,
     scrape_tweets_and_replies,
     record_tweet,
     scrape_user_tweets,
     scrape_tweet_replies,
+    start_next_scraping_request,
 )
 from tweets.utils import tweet_to_json
+from twitter_scraping.celery import app as celery_app
 
 tz = timezone.get_default_timezone()
 
@@ -103,6 +110,28 @@ class RecordTweetTest(BaseTweetTestCase):
         self._validate_user(tweet.user, scraped_tweet.user)
         self.assertEqual(tweet.raw_tweet_object, tweet_json)
 
+    def test_record_tweet_doesnt_modify_scraped_tweet(self):
+        scraped_tweet = deepcopy(tweet_with_quoted_tweet)
+        record_tweet(scraped_tweet, self.req.id)
+        self.assertEqual(scraped_tweet, tweet_with_quoted_tweet)
+
+    def test_record_tweet_raw_tweet_object(self):
+        scraped_tweet = deepcopy(tweet_with_quoted_tweet)
+        tweet, created = record_tweet(scraped_tweet, self.req.id)
+        raw_tweet = Tweet.objects.get(id=tweet.id).raw_tweet_object
+
+        self.assertEqual(raw_tweet["id"], scraped_tweet.id)
+        self.assertEqual(raw_tweet["replyCount"], scraped_tweet.replyCount)
+        self.assertEqual(raw_tweet["date"], scraped_tweet.date.isoformat())
+        self.assertEqual(raw_tweet["user"]["username"], scraped_tweet.user.username)
+        self.assertEqual(raw_tweet["quotedTweet"]["id"], scraped_tweet.quotedTweet.id)
+        self.assertEqual(
+            Tweet.objects.filter(
+                raw_tweet_object__user__username=scraped_tweet.user.username
+            ).count(),
+            1,
+        )
+
     def test_record_tweet_quoted_tweet(self):
         scraped_tweet = deepcopy(tweet_with_quoted_tweet)
         tweet, created = record_tweet(scraped_tweet, self.req.id)
@@ -185,7 +214,9 @@ class ScrapeUserTweetsTest(BaseTweetTestCase):
             [user_tweet_1, user_tweet_2, user_tweet_3].__iter__()
         ]
         results = scrape_user_tweets(self.req.id)
-        self.assertEqual({"created_tweets": 3, "updated_tweets": 0}, results)
+        self.assertEqual(
+            {"created_tweets": 3, "updated_tweets": 0, "timings": ANY}, results
+        )
 
         self.assertTrue(
             ScrapingRequest.objects.filter(
@@ -203,13 +234,233 @@ class ScrapeUserTweetsTest(BaseTweetTestCase):
             )
         )
 
-        tweets = Tweet.objects.all()
+        tweets = Tweet.objects.order_by("id")
         self._validate_tweet(tweets[0], user_tweet_1)
         self._validate_tweet(tweets[1], user_tweet_2)
         self._validate_tweet(tweets[2], user_tweet_3)
 
         start_next_scraping_request_mock.assert_called()
 
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_out_of_period(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+    ):
+        self.req.since = timezone.datetime(2023, 2, 1, tzinfo=timezone.utc)
+        self.req.until = timezone.datetime(2023, 4, 27, 18, 0, tzinfo=timezone.utc)
+        self.req.save()
+        user_scraper_mock.side_effect = [
+            [user_tweet_1, user_tweet_2, user_tweet_3, normal_tweet].__iter__()
+        ]
+        results = scrape_user_tweets(self.req.id)
+        self.assertEqual(
+            {"created_tweets": 2, "updated_tweets": 0, "timings": ANY}, results
+        )
+
+        self.assertFalse(Tweet.objects.filter(twitter_id=str(user_tweet_1.id)))
+        self.assertFalse(Tweet.objects.filter(twitter_id=str(user_tweet_2.id)))
+        counts = self.req.get_counts()
+        self.assertEqual(counts["period_tweets"], 2)
+        self.assertEqual(counts["out_of_period_tweets"], 2)
+
+    @override_settings(CELERY_ALWAYS_EAGER=True, INCREMENTAL_KNOWN_TWEETS=2)
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_incremental(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+    ):
+        # The high-water mark is user_tweet_3, the newest stored tweet
+        record_tweet(user_tweet_3, self.req.id)
+        record_tweet(normal_tweet, self.req.id)
+
+        self.req.finish()
+        # The refresh of an already scraped period reuses its request
+        (req,) = create_scraping_requests(
+            [self.req.username],
+            [{"since": "2022-01-01", "until": "2024-01-01"}],
+            incremental=True,
+        )
+        self.assertEqual(req.id, self.req.id)
+        fetched = []
+
+        def scraper():
+            # user_tweet_1 is an older pinned tweet, and user_tweet_2 is the only new one
+            for tweet in [
+                user_tweet_1,
+                user_tweet_2,
+                user_tweet_3,
+                normal_tweet,
+                tweet_with_retweet,
+            ]:
+                fetched.append(tweet)
+                yield tweet
+
+        user_scraper_mock.side_effect = [scraper()]
+        with self.settings(SCRAPING_PREFETCH_SIZE=0):
+            results = scrape_user_tweets(req.id)
+
+        self.assertEqual(
+            {"created_tweets": 1, "updated_tweets": 0, "timings": ANY}, results
+        )
+        self.assertEqual(
+            fetched, [user_tweet_1, user_tweet_2, user_tweet_3, normal_tweet]
+        )
+        self.assertTrue(Tweet.objects.filter(twitter_id=str(user_tweet_2.id)))
+        self.assertFalse(Tweet.objects.filter(twitter_id=str(user_tweet_1.id)))
+        self.assertEqual(self.req.get_counts()["known_tweets_skipped"], 3)
+
+    @override_settings(
+        CELERY_ALWAYS_EAGER=True,
+        INCREMENTAL_KNOWN_TWEETS=2,
+        SCRAPING_BATCH_SIZE=2,
+        SCRAPING_PREFETCH_SIZE=0,
+    )
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_incremental_resumed(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+    ):
+        # The high-water mark is normal_tweet, and four newer tweets were posted since
+        record_tweet(normal_tweet, self.req.id)
+        self.req.finish()
+        (req,) = create_scraping_requests(
+            [self.req.username],
+            [{"since": "2022-01-01", "until": "2024-01-01"}],
+            incremental=True,
+        )
+        new_tweets = [
+            replace(
+                deepcopy(user_tweet_1),
+                id=user_tweet_2.id + i,
+                date=normal_tweet.date + timedelta(days=i),
+            )
+            for i in range(4, 0, -1)
+        ]
+
+        def interrupted_scraper():
+            yield from new_tweets[:2]
+            raise Exception("Connection lost")
+
+        user_scraper_mock.side_effect = [
+            interrupted_scraper(),
+            iter(new_tweets + [normal_tweet, tweet_with_retweet]),
+        ]
+        scrape_user_tweets(req.id)
+        req.refresh_from_db()
+        self.assertEqual(req.status, "interrupted")
+        self.assertEqual(req.checkpoint_tweet_id, str(new_tweets[1].id))
+
+        # The tweets written before the interruption don't move the mark, so the two
+        # older new tweets aren't taken for known ones
+        req.reset(keep_checkpoint=True)
+        scrape_user_tweets(req.id)
+        req.refresh_from_db()
+        self.assertEqual(req.status, "finished")
+        for tweet in new_tweets:
+            self.assertTrue(Tweet.objects.filter(twitter_id=str(tweet.id)).exists())
+        self.assertEqual(req.high_water_mark, normal_tweet.date)
+
+    @override_settings(SCRAPING_LEASE_MINUTES=60, SCRAPING_PREFETCH_SIZE=0)
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_heartbeat_without_writes(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+    ):
+        # The tweets are newer than the period, so none is written
+        self.req.until = timezone.datetime(2023, 1, 1, tzinfo=tz)
+        self.req.save()
+        clock = [timezone.now()]
+        requeued = []
+
+        def slow_scraper():
+            for tweet in [user_tweet_2, user_tweet_3, normal_tweet]:
+                clock[0] += timedelta(minutes=40)
+                requeued.extend(ScrapingRequest.objects.requeue_expired())
+                yield tweet
+
+        user_scraper_mock.side_effect = [slow_scraper()]
+        with patch("django.utils.timezone.now", side_effect=lambda: clock[0]):
+            scrape_user_tweets(self.req.id)
+
+        self.assertEqual(requeued, [])
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "finished")
+        self.assertEqual(self.req.get_counts()["out_of_period_tweets"], 3)
+
+    @patch("tweets.tasks.ScraperPrefetcher")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_lookup_error(
+        self, start_next_scraping_request_mock, prefetcher_mock
+    ):
+        # The prefetcher thread would be left scraping, as nothing would close it
+        with patch.object(
+            ScrapingRequest, "get_checkpointed_tweet_ids", side_effect=DatabaseError
+        ):
+            scrape_user_tweets(self.req.id)
+
+        prefetcher_mock.assert_not_called()
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "interrupted")
+
+    def test_high_water_mark(self):
+        self.assertIsNone(self.req.get_high_water_mark())
+        record_tweet(user_tweet_1, self.req.id)
+        record_tweet(user_tweet_3, self.req.id)
+        self.assertEqual(self.req.get_high_water_mark(), user_tweet_3.date)
+
+        # Tweets stored by conversation scrapings don't move the mark
+        conversation_req = ScrapingRequest.objects.create(
+            username=self.req.username, twitter_id=str(user_tweet_1.id)
+        )
+        record_tweet(user_tweet_2, conversation_req.id)
+        self.assertEqual(self.req.get_high_water_mark(), user_tweet_3.date)
+
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_timings(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+    ):
+        user_scraper_mock.side_effect = [
+            [user_tweet_1, user_tweet_2, user_tweet_3].__iter__()
+        ]
+        results = scrape_user_tweets(self.req.id)
+
+        self.assertEqual(
+            list(results["timings"]),
+            [
+                "fetch",
+                "serialize",
+                "user_upsert",
+                "tweet_upsert",
+                "link_resolution",
+                "log_writes",
+            ],
+        )
+        stored = self.req.get_timings()
+        self.assertEqual(list(stored), list(results["timings"]))
+        for stage, seconds in results["timings"].items():
+            self.assertAlmostEqual(stored[stage], seconds, delta=0.001)
+
+        # Timings of later runs of the request add up
+        user_scraper_mock.side_effect = [[user_tweet_1].__iter__()]
+        results = scrape_user_tweets(self.req.id)
+        self.assertAlmostEqual(
+            self.req.get_timings()["fetch"],
+            stored["fetch"] + results["timings"]["fetch"],
+            delta=0.002,
+        )
+
     def test_tombstone(self):
         ...
 
@@ -233,15 +484,56 @@ class ScrapeTweetRepliesTest(BaseTweetTestCase):
             [normal_tweet, tweet_in_reply_to, tweet_replying_another_reply].__iter__()
         ]
         results = scrape_tweet_replies(normal_tweet.id, self.req.id)
-        self.assertEqual({"created_tweets": 3, "updated_tweets": 0}, results)
+        self.assertEqual(
+            {"created_tweets": 3, "updated_tweets": 0, "timings": ANY}, results
+        )
 
-        tweets = Tweet.objects.all()
+        tweets = Tweet.objects.order_by("id")
         self._validate_tweet(tweets[0], normal_tweet)
         self._validate_tweet(tweets[1], tweet_in_reply_to)
         self._validate_tweet(tweets[2], tweet_replying_another_reply)
 
         start_next_scraping_request_mock.assert_called()
 
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch("tweets.tasks.TwitterTweetScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    @patch("tweets.ingestion.TweetBatchWriter.add")
+    def test_scrape_tweet_replies_from_checkpoint(
+        self, add_mock, start_next_scraping_request_mock, scraper_mock
+    ):
+        record_tweet(normal_tweet, self.req.id)
+        self.req.save_checkpoint([str(normal_tweet.id)], [], str(normal_tweet.id))
+        self.req.interrupt()
+
+        scraper_mock.side_effect = [
+            [normal_tweet, tweet_in_reply_to, tweet_replying_another_reply].__iter__()
+        ]
+        scrape_tweet_replies(normal_tweet.id, self.req.id)
+
+        self.assertEqual(
+            [call.args[0] for call in add_mock.call_args_list],
+            [tweet_in_reply_to, tweet_replying_another_reply],
+        )
+
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @patch("tweets.tasks.TwitterTweetScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_tweet_replies_saves_checkpoint(
+        self, start_next_scraping_request_mock, scraper_mock
+    ):
+        scraper_mock.side_effect = [
+            [normal_tweet, tweet_in_reply_to, tweet_replying_another_reply].__iter__()
+        ]
+        with self.settings(SCRAPING_BATCH_SIZE=2):
+            scrape_tweet_replies(normal_tweet.id, self.req.id)
+
+        self.req.refresh_from_db()
+        self.assertEqual(
+            self.req.checkpoint_tweet_id, str(tweet_replying_another_reply.id)
+        )
+        self.assertEqual(self.req.created_tweets_count, 3)
+
     def test_tombstone(self):
         ...
 
@@ -249,6 +541,295 @@ class ScrapeTweetRepliesTest(BaseTweetTestCase):
         ...
 
 
+class ConversationFanOutTest(BaseTweetTestCase):
+    def setUp(self):
+        self.req = ScrapingRequest.objects.create(
+            username="GergelyOrosz",
+            include_replies=False,
+            since=timezone.datetime(2022, 1, 1, tzinfo=tz),
+            until=timezone.datetime(2024, 1, 1, tzinfo=tz),
+        )
+
+    @override_settings(CONVERSATION_FANOUT=True, CONVERSATION_FANOUT_CONCURRENCY=2)
+    @patch("tweets.tasks.TwitterTweetScraper.get_items")
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_scrape_user_tweets_fan_out(
+        self, start_next_scraping_request_mock, user_scraper_mock, replies_scraper_mock
+    ):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        user_scraper_mock.side_effect = [[user_tweet_1, normal_tweet].__iter__()]
+        replies_scraper_mock.side_effect = [
+            [tweet_in_reply_to].__iter__(),
+            [tweet_replying_another_reply].__iter__(),
+        ]
+        scrape_user_tweets(self.req.id)
+
+        conversation_requests = self.req.conversation_requests.all()
+        self.assertEqual(conversation_requests.count(), 2)
+        for req in conversation_requests:
+            self.assertEqual(req.status, "finished")
+
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "finished")
+        self.assertEqual(self.req.get_counts()["conversation_requests_finished"], 2)
+        reply = Tweet.objects.get(twitter_id=str(tweet_replying_another_reply.id))
+        self.assertEqual(reply.in_reply_to_tweet.twitter_id, str(tweet_in_reply_to.id))
+        self.assertEqual(reply.conversation_tweet.twitter_id, str(normal_tweet.id))
+        start_next_scraping_request_mock.assert_called()
+
+    @override_settings(CONVERSATION_FANOUT=True, CONVERSATION_FANOUT_CONCURRENCY=1)
+    @patch("tweets.tasks.TwitterTweetScraper.get_items")
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_fan_out_skips_started_conversations(
+        self, start_next_scraping_request_mock, user_scraper_mock, replies_scraper_mock
+    ):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        user_scraper_mock.side_effect = [[user_tweet_1, normal_tweet].__iter__()]
+        replies_scraper_mock.side_effect = [[tweet_in_reply_to].__iter__()]
+
+        create_requests = ScrapingRequest.create_conversation_scraping_requests
+
+        def create_conversation_scraping_requests(req):
+            reqs = create_requests(req)
+            # Started by the scheduler before its chain gets to it
+            reqs[0].start()
+            return reqs
+
+        with patch.object(
+            ScrapingRequest,
+            "create_conversation_scraping_requests",
+            create_conversation_scraping_requests,
+        ):
+            scrape_user_tweets(self.req.id)
+
+        self.assertEqual(replies_scraper_mock.call_count, 1)
+        first, second = self.req.conversation_requests.order_by("id")
+        self.assertEqual(first.status, "started")
+        self.assertEqual(second.status, "finished")
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "started")
+
+        # The scheduler finishes the parent along with the last conversation
+        replies_scraper_mock.side_effect = [[].__iter__()]
+        scrape_tweet_replies(first.twitter_id, first.id)
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "finished")
+
+    @override_settings(CONVERSATION_FANOUT=True, CONVERSATION_FANOUT_CONCURRENCY=1)
+    @patch("tweets.tasks.finish_conversation_scraping")
+    @patch("tweets.tasks.TwitterTweetScraper.get_items")
+    @patch("snscrape.modules.twitter.TwitterProfileScraper.get_items")
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_fan_out_broken_chain(
+        self,
+        start_next_scraping_request_mock,
+        user_scraper_mock,
+        replies_scraper_mock,
+        finish_conversation_scraping_mock,
+    ):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        user_scraper_mock.side_effect = [[user_tweet_1, normal_tweet].__iter__()]
+        replies_scraper_mock.side_effect = [[tweet_in_reply_to].__iter__()]
+        finish_conversation_scraping_mock.side_effect = Exception("Worker lost")
+
+        scrape_user_tweets(self.req.id)
+
+        first, second = self.req.conversation_requests.order_by("id")
+        self.assertEqual(first.status, "finished")
+        self.assertEqual(second.status, "interrupted")
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "interrupted")
+
+    @patch("tweets.tasks.start_next_scraping_request.delay")
+    def test_finish_conversation_scraping_after_last_conversation(
+        self, start_next_scraping_request_mock
+    ):
+        self.req.start()
+        first = ScrapingRequest.objects.create(parent=self.req, status="finished")
+        second = ScrapingRequest.objects.create(parent=self.req, status="started")
+
+        self.assertIsNone(finish_conversation_scraping(self.req.id))
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "started")
+
+        second.interrupt()
+        self.assertIsNotNone(finish_conversation_scraping(self.req.id))
+        self.assertIsNone(finish_conversation_scraping(self.req.id))
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "finished")
+        self.assertEqual(self.req.get_counts()["conversation_requests_interrupted"], 1)
+        start_next_scraping_request_mock.assert_called_once()
+
+
+@override_settings(MAX_SCRAPINGS=2)
+@patch("tweets.models.ScrapingRequest.dispatch_scraping_task")
+class StartNextScrapingRequestTest(TestCase):
+    def setUp(self):
+        self.reqs = [
+            ScrapingRequest.objects.create(username=username)
+            for username in ["user1", "user2", "user3"]
+        ]
+
+    def test_respects_max_scrapings(self, dispatch_mock):
+        self.reqs[0].start()
+
+        self.assertEqual(start_next_scraping_request(), [self.reqs[1].id])
+        self.assertEqual(dispatch_mock.call_count, 1)
+        self.assertEqual(start_next_scraping_request(), [])
+
+        statuses = ScrapingRequest.objects.order_by("id").values_list(
+            "status", flat=True
+        )
+        self.assertEqual(list(statuses), ["started", "started", "created"])
+
+    def test_doesnt_start_request_twice(self, dispatch_mock):
+        self.assertEqual(
+            start_next_scraping_request(), [self.reqs[0].id, self.reqs[1].id]
+        )
+        self.reqs[0].finish()
+        self.assertEqual(start_next_scraping_request(), [self.reqs[2].id])
+        self.assertEqual(dispatch_mock.call_count, 3)
+
+    def test_skips_while_another_scheduler_holds_the_lock(self, dispatch_mock):
+        other_connection = connections.create_connection("default")
+        self.addCleanup(other_connection.close)
+        with other_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [SCHEDULER_LOCK_ID])
+
+        self.assertEqual(start_next_scraping_request(), [])
+        dispatch_mock.assert_not_called()
+
+        with other_connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [SCHEDULER_LOCK_ID])
+        self.assertEqual(len(start_next_scraping_request()), 2)
+
+    def test_higher_priority_first(self, dispatch_mock):
+        conversation_req = ScrapingRequest.objects.create(
+            username="user1", include_replies=True, priority=-10
+        )
+        important_req = ScrapingRequest.objects.create(username="user4", priority=5)
+
+        self.assertEqual(
+            start_next_scraping_request(), [important_req.id, self.reqs[0].id]
+        )
+        self.assertEqual(
+            list(ScrapingRequest.objects.queue_order())[-1], conversation_req
+        )
+
+    def test_usernames_take_turns(self, dispatch_mock):
+        ScrapingRequest.objects.filter(id=self.reqs[1].id).update(username="user1")
+
+        self.assertEqual(
+            start_next_scraping_request(), [self.reqs[0].id, self.reqs[2].id]
+        )
+
+    @override_settings(SCRAPING_PRIORITY_AGING_HOURS=24)
+    def test_waiting_requests_gain_priority(self, dispatch_mock):
+        ScrapingRequest.objects.filter(id=self.reqs[2].id).update(
+            priority=-2, created=timezone.now() - timezone.timedelta(days=3)
+        )
+
+        self.assertEqual(
+            start_next_scraping_request(), [self.reqs[2].id, self.reqs[0].id]
+        )
+
+    @override_settings(SCRAPING_LEASE_MINUTES=60)
+    def test_requeues_expired_requests(self, dispatch_mock):
+        self.assertEqual(
+            start_next_scraping_request(), [self.reqs[0].id, self.reqs[1].id]
+        )
+        # The worker of the first request stopped, while the second one saves a checkpoint
+        ScrapingRequest.objects.filter(id=self.reqs[0].id).update(
+            heartbeat_at=timezone.now() - timezone.timedelta(minutes=61)
+        )
+        self.reqs[1].save_checkpoint(["1"], [], "1")
+
+        self.assertEqual(start_next_scraping_request(), [self.reqs[0].id])
+        self.reqs[0].refresh_from_db()
+        self.assertEqual(self.reqs[0].status, "started")
+        self.assertIn("Heartbeat expirado", self.reqs[0].get_logs())
+        self.assertEqual(dispatch_mock.call_count, 3)
+
+    @override_settings(SCRAPING_LEASE_MINUTES=60)
+    def test_waiting_parent_doesnt_expire(self, dispatch_mock):
+        parent = self.reqs[0]
+        parent.start()
+        ScrapingRequest.objects.filter(id=parent.id).update(
+            heartbeat_at=timezone.now() - timezone.timedelta(days=1)
+        )
+        ScrapingRequest.objects.create(username="user1", parent=parent)
+
+        self.assertEqual(ScrapingRequest.objects.requeue_expired(), [])
+        # Nor takes a slot from its conversation requests
+        self.assertEqual(len(start_next_scraping_request()), 2)
+
+    def test_dispatch_failure_releases_request(self, dispatch_mock):
+        dispatch_mock.side_effect = [Exception("broker down"), None]
+
+        self.assertEqual(start_next_scraping_request(), [self.reqs[1].id])
+        self.reqs[0].refresh_from_db()
+        self.assertEqual(self.reqs[0].status, "created")
+
+
+class CreateScrapingRequestsTest(TestCase):
+    periods = [
+        {"since": "2022-01-01", "until": "2022-07-01"},
+        {"since": "2022-07-01", "until": "2023-01-01"},
+    ]
+
+    def test_creates_missing_requests(self):
+        ScrapingRequest.objects.create(
+            username="user2",
+            since=timezone.make_aware(timezone.datetime(2022, 7, 1)),
+            until=timezone.make_aware(timezone.datetime(2023, 1, 1)),
+            include_replies=False,
+        )
+
+        with self.assertNumQueries(3):
+            created = create_scraping_requests(["user1", "user2"], self.periods)
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(ScrapingRequest.objects.count(), 4)
+        self.assertFalse(ScrapingRequest.objects.filter(include_replies=True).exists())
+        self.assertEqual(create_scraping_requests(["user1", "user2"], self.periods), [])
+
+    def test_incremental_refresh(self):
+        created = create_scraping_requests(["user1"], self.periods[:1])
+        ScrapingRequest.objects.filter(id=created[0].id).update(status="finished")
+
+        refreshed = create_scraping_requests(
+            ["user1"], self.periods, incremental=True, priority=2
+        )
+
+        self.assertEqual(len(refreshed), 2)
+        self.assertEqual(refreshed[1].id, created[0].id)
+        self.assertEqual(ScrapingRequest.objects.count(), 2)
+        req = ScrapingRequest.objects.get(id=created[0].id)
+        self.assertEqual(req.status, "created")
+        self.assertTrue(req.incremental)
+        self.assertEqual(req.priority, 2)
+        # Requests still pending aren't queued twice
+        self.assertEqual(
+            create_scraping_requests(["user1"], self.periods, incremental=True), []
+        )
+
+    def test_profile_requests_are_unique(self):
+        values = dict(
+            username="user1",
+            since=timezone.make_aware(timezone.datetime(2022, 1, 1)),
+            until=timezone.make_aware(timezone.datetime(2022, 7, 1)),
+            include_replies=False,
+        )
+        ScrapingRequest.objects.create(**values)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ScrapingRequest.objects.create(**values)
+
+
 class TasksTest(TestCase):
     def setUp(self):
         self.tweet1 = deepcopy(tweet1)
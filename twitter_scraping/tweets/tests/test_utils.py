@@ -0,0 +1,182 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import shutil
+import tempfile
+
+from tweets.models import Tweet, TwitterUser
+from tweets.tests.helpers import QueryBudgetMixin
+from tweets.utils import DATASET_PARTITIONING, EXPORT_SCHEMA, export
+
+tz = timezone.get_default_timezone()
+
+
+class ExportTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.export_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_path)
+        user = TwitterUser.objects.create(
+            twitter_id="999",
+            username="random_username",
+            display_name="Random User",
+            description="Just another user",
+            account_created_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+        )
+        root = Tweet.objects.create(
+            twitter_id="100",
+            content="root tweet",
+            published_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+            user=user,
+            view_count=10,
+        )
+        for i in range(4):
+            Tweet.objects.create(
+                twitter_id=str(101 + i),
+                content=f"reply; {i}",
+                published_at=timezone.datetime(2022, 1, 1, 12, i + 1, 0, 0, tz),
+                in_reply_to_id="100",
+                in_reply_to_tweet=root,
+                conversation_id="100",
+                conversation_tweet=root,
+                user=user,
+            )
+        self.queryset = Tweet.objects.order_by("twitter_id")
+
+    def _export(self, **kwargs):
+        with override_settings(DEFAULT_EXPORT_PATH=f"{self.export_path}/"):
+            return export(self.queryset, "test", **kwargs)
+
+    def test_export_csv(self):
+        filepath = self._export(chunk_size=2)
+
+        df = pd.read_csv(
+            filepath, sep=";", index_col=0, dtype={"id": str, "view_count": str}
+        )
+        self.assertEqual(list(df.index), [0, 1, 2, 3, 4])
+        self.assertEqual(list(df.columns), EXPORT_SCHEMA.names)
+        self.assertEqual(list(df["id"]), ["100", "101", "102", "103", "104"])
+        self.assertEqual(df["content"][1], "reply; 0")
+        self.assertEqual(list(df["in_reply_to_user"][1:]), ["random_username"] * 4)
+        # Written as an integer, though the rest of its chunk has no views
+        self.assertEqual(df["view_count"][0], "10")
+
+    def test_export_parquet(self):
+        filepath = self._export(format="parquet", chunk_size=2)
+
+        parquet_file = pq.ParquetFile(filepath)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertEqual(parquet_file.schema_arrow, EXPORT_SCHEMA)
+        table = parquet_file.read()
+        self.assertEqual(table["id"].to_pylist(), ["100", "101", "102", "103", "104"])
+        self.assertEqual(table["view_count"].to_pylist(), [10, None, None, None, None])
+        self.assertEqual(
+            table["date"][1].as_py(), timezone.datetime(2022, 1, 1, 12, 1, tzinfo=tz)
+        )
+
+    def test_export_dataset(self):
+        other_user = TwitterUser.objects.create(
+            twitter_id="998",
+            username="other_username",
+            display_name="Other User",
+            description="Just another user",
+            account_created_at=timezone.datetime(2022, 1, 1, 12, 0, 0, 0, tz),
+        )
+        Tweet.objects.create(
+            twitter_id="200",
+            content="other root tweet",
+            published_at=timezone.datetime(2022, 2, 1, 12, 0, 0, 0, tz),
+            user=other_user,
+        )
+        Tweet.objects.create(
+            twitter_id="201",
+            content="reply to other",
+            published_at=timezone.datetime(2022, 2, 1, 13, 0, 0, 0, tz),
+            in_reply_to_id="200",
+            conversation_id="200",
+            user=TwitterUser.objects.get(username="random_username"),
+        )
+        filepath = self._export(format="dataset", chunk_size=2)
+
+        # A file per partition, though their tweets are spread over the chunks
+        partitions = sorted(
+            (os.path.relpath(path, filepath), files)
+            for path, _, files in os.walk(filepath)
+            if files
+        )
+        self.assertEqual(
+            partitions,
+            [
+                (
+                    "month=2022-01/conversation_user=__HIVE_DEFAULT_PARTITION__",
+                    ["part-0.parquet"],
+                ),
+                (
+                    "month=2022-01/conversation_user=random_username",
+                    ["part-0.parquet"],
+                ),
+                (
+                    "month=2022-02/conversation_user=__HIVE_DEFAULT_PARTITION__",
+                    ["part-0.parquet"],
+                ),
+                (
+                    "month=2022-02/conversation_user=other_username",
+                    ["part-0.parquet"],
+                ),
+            ],
+        )
+
+        dataset = ds.dataset(
+            filepath, format="parquet", partitioning=DATASET_PARTITIONING
+        )
+        self.assertEqual(dataset.schema.field("user").type.value_type, pa.string())
+        self.assertTrue(pa.types.is_dictionary(dataset.schema.field("user").type))
+        fragment = next(dataset.get_fragments())
+        self.assertEqual(fragment.metadata.row_group(0).column(0).compression, "ZSTD")
+
+        table = dataset.to_table(
+            filter=(ds.field("month") == "2022-01")
+            & (ds.field("conversation_user") == "random_username")
+        ).sort_by("id")
+        self.assertEqual(table["id"].to_pylist(), ["101", "102", "103", "104"])
+        self.assertEqual(table["user"].to_pylist(), ["random_username"] * 4)
+        table = dataset.to_table(filter=ds.field("month") == "2022-02").sort_by("id")
+        self.assertEqual(table["id"].to_pylist(), ["200", "201"])
+
+    def test_export_empty(self):
+        self.queryset = Tweet.objects.none()
+        df = pd.read_csv(self._export(), sep=";", index_col=0)
+        self.assertEqual(list(df.columns), EXPORT_SCHEMA.names)
+        self.assertEqual(len(df), 0)
+        self.assertEqual(pq.read_table(self._export(format="parquet")).num_rows, 0)
+        dataset = ds.dataset(self._export(format="dataset"), format="parquet")
+        self.assertEqual(dataset.count_rows(), 0)
+
+    def test_export_queries(self):
+        # A reply not linked to its tweets yet gets their usernames by twitter id
+        Tweet.objects.create(
+            twitter_id="105",
+            content="unlinked reply",
+            published_at=timezone.datetime(2022, 1, 1, 12, 5, 0, 0, tz),
+            in_reply_to_id="100",
+            conversation_id="100",
+            user=TwitterUser.objects.get(),
+        )
+        with self.assertQueryBudget(1):
+            filepath = self._export(format="parquet", chunk_size=2)
+
+        table = pq.read_table(filepath)
+        self.assertEqual(table["in_reply_to_user"][5].as_py(), "random_username")
+        self.assertEqual(table["conversation_user"][5].as_py(), "random_username")
+        self.assertIsNone(table["in_reply_to_user"][0].as_py())
+        self.assertIsNone(Tweet.objects.get(twitter_id="105").in_reply_to_tweet)
+
+    def test_export_tweet(self):
+        tweet = Tweet.objects.get(twitter_id="101")
+        exported = tweet.export()
+        self.assertEqual(list(exported), EXPORT_SCHEMA.names)
+        self.assertEqual(exported["user"], "random_username")
+        self.assertEqual(exported["conversation_user"], "random_username")
@@ -0,0 +1,57 @@
+from collections import defaultdict
+import time
+
+# Stages of a scraping, in the order a tweet goes through them
+STAGES = [
+    "fetch",
+    "serialize",
+    "user_upsert",
+    "tweet_upsert",
+    "link_resolution",
+    "log_writes",
+]
+
+
+class StageTimings:
+    """Accumulates the time spent in each stage of a scraping.
+
+    Used as `with timings.measure("fetch"): ...`. Fetching is measured as the time the
+    task waits for the next scraped item, which is less than the scraping time when the
+    items are prefetched. Timings are logged as "<stage>_ms" counters of the request.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def measure(self, stage):
+        return _Measurement(self, stage)
+
+    def as_dict(self):
+        return {stage: self.seconds[stage] for stage in STAGES if stage in self.seconds}
+
+    def as_counts(self):
+        return {
+            f"{stage}_ms": round(seconds * 1000)
+            for stage, seconds in self.as_dict().items()
+        }
+
+    @staticmethod
+    def from_counts(counts):
+        """Seconds by stage of the "<stage>_ms" counters of a request"""
+        return {
+            stage: counts[f"{stage}_ms"] / 1000
+            for stage in STAGES
+            if f"{stage}_ms" in counts
+        }
+
+
+class _Measurement:
+    def __init__(self, timings, stage):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.timings.seconds[self.stage] += time.perf_counter() - self.started_at
@@ -1,29 +1,191 @@
-from copy import deepcopy
+from dataclasses import fields, is_dataclass
 from datetime import datetime
 from django.conf import settings
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
-import json
+from enum import Enum
+from itertools import islice
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from urllib.parse import quote
 from tweets.models import Tweet, ScrapingRequest
 from tweets.values import ELECTED_SP_STATE_DEP, ELECTED_SP_FED_DEP
 
+# Types of the columns of Tweet.export_columns(), so that every Parquet row group has the
+# same schema
+EXPORT_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("date", pa.timestamp("us", tz="UTC")),
+        ("user", pa.string()),
+        ("content", pa.string()),
+        ("in_reply_to_id", pa.string()),
+        ("in_reply_to_user", pa.string()),
+        ("conversation_id", pa.string()),
+        ("conversation_user", pa.string()),
+        ("reply_count", pa.int64()),
+        ("retweet_count", pa.int64()),
+        ("like_count", pa.int64()),
+        ("quote_count", pa.int64()),
+        ("view_count", pa.int64()),
+    ]
+)
+INTEGER_COLUMNS = [
+    field.name for field in EXPORT_SCHEMA if pa.types.is_integer(field.type)
+]
 
-def export(queryset, filename=None, format="csv"):
-    print(f"export({queryset.count()=}, {filename=}, {format=})")
+# The dataset export stores the usernames, repeated over most rows, dictionary encoded,
+# and is partitioned by the month of the tweets and the username of the conversation root
+USERNAME_COLUMNS = ["user", "in_reply_to_user", "conversation_user"]
+DATASET_SCHEMA = pa.schema(
+    [
+        (
+            pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+            if field.name in USERNAME_COLUMNS
+            else field
+        )
+        for field in EXPORT_SCHEMA
+    ]
+    + [pa.field("month", pa.string())]
+)
+DATASET_PARTITIONING = ds.partitioning(
+    pa.schema([("month", pa.string()), ("conversation_user", pa.string())]),
+    flavor="hive",
+)
+PARTITION_COLUMNS = DATASET_PARTITIONING.schema.names
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# The partition columns are in the directory names, not in the files
+DATASET_FILE_SCHEMA = pa.schema(
+    [field for field in DATASET_SCHEMA if field.name not in PARTITION_COLUMNS]
+)
+
+
+def export(queryset, filename=None, format="csv", chunk_size=10000):
+    """Exports the tweets of queryset to a file in DEFAULT_EXPORT_PATH and returns its path.
+
+    Tweets are read from a server side cursor and written chunk_size at a time, as CSV
+    chunks or Parquet row groups, so memory use doesn't grow with the size of the export.
+
+    The dataset format writes a directory of zstd compressed Parquet files, one per hive
+    partition like month=2022-10/conversation_user=username/, so that readers can load
+    only the months and conversations they need.
+    """
+    print(f"export({filename=}, {format=})")
     if not filename:
         filename = f"{queryset.model.__name__.lower()}s"
     time_signature = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
     filepath = f"{settings.DEFAULT_EXPORT_PATH}{time_signature} {filename}"
-    df = pd.DataFrame(tweet.export() for tweet in queryset)
+    if format == "dataset":
+        # Tweets of a partition come in a row, so that each gets a single file
+        queryset = queryset.order_by(*dataset_ordering(), *queryset.query.order_by)
+    chunks = export_chunks(queryset, chunk_size)
 
     if format == "csv":
         filepath = f"{filepath}.csv"
-        chunksize = 1000
-        df.to_csv(filepath, chunksize=chunksize, sep=";")
+        with open(filepath, "w", newline="") as f:
+            for i, df in enumerate(chunks):
+                df.to_csv(f, header=i == 0, sep=";")
 
     if format == "parquet":
         filepath = f"{filepath}.parquet"
-        df.to_parquet(filepath)
+        with pq.ParquetWriter(filepath, EXPORT_SCHEMA) as writer:
+            for df in chunks:
+                writer.write_table(
+                    pa.Table.from_pandas(df, schema=EXPORT_SCHEMA, preserve_index=False)
+                )
+
+    if format == "dataset":
+        os.makedirs(filepath)
+        write_partitions(map(dataset_table, chunks), filepath)
+
+    return filepath
+
+
+def export_chunks(queryset, chunk_size):
+    """Yields the exported tweets of queryset as DataFrames of up to chunk_size rows,
+    indexed by their position in the export. An empty export yields an empty DataFrame.
+    """
+    # A single query, with no lazy loads of the related tweets and users
+    rows = queryset.values_list(*Tweet.export_columns().values()).iterator(
+        chunk_size=chunk_size
+    )
+    start = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk and start:
+            return
+        df = pd.DataFrame(
+            chunk,
+            index=range(start, start + len(chunk)),
+            columns=EXPORT_SCHEMA.names,
+        )
+        # Nullable integers, or a chunk with a missing count would have floats
+        yield df.astype(dict.fromkeys(INTEGER_COLUMNS, "Int64"))
+        if len(chunk) < chunk_size:
+            return
+        start += len(chunk)
+
+
+def dataset_table(df):
+    """The exported DataFrame as a table of the dataset export, with the month of the
+    tweets in TIME_ZONE
+    """
+    dates = pd.to_datetime(df["date"], utc=True).dt.tz_convert(settings.TIME_ZONE)
+    df["month"] = dates.dt.strftime("%Y-%m")
+    return pa.Table.from_pandas(df, schema=DATASET_SCHEMA, preserve_index=False)
+
+
+def dataset_ordering():
+    """Orders the exported tweets by their partition of the dataset export"""
+    month = TruncMonth("published_at", tzinfo=timezone.get_default_timezone())
+    return [month, Tweet.export_columns()["conversation_user"].asc()]
+
+
+def write_partitions(tables, path):
+    """Writes tables of the dataset export, ordered by partition, to a Parquet file per
+    partition in the hive directories under path. A file is open at a time, and is closed
+    when the tables move on to the next partition.
+    """
+    writer = key = None
+    try:
+        for table in tables:
+            keys = list(zip(*(table[name].to_pylist() for name in PARTITION_COLUMNS)))
+            start = 0
+            while start < len(keys):
+                end = start + 1
+                while end < len(keys) and keys[end] == keys[start]:
+                    end += 1
+                if keys[start] != key:
+                    if writer:
+                        writer.close()
+                    key = keys[start]
+                    writer = partition_writer(path, key)
+                rows = table.slice(start, end - start)
+                writer.write_table(rows.select(DATASET_FILE_SCHEMA.names))
+                start = end
+    finally:
+        if writer:
+            writer.close()
+
+
+def partition_writer(path, key):
+    directory = os.path.join(
+        path,
+        *(
+            f"{name}={quote(value, safe='') if value else HIVE_DEFAULT_PARTITION}"
+            for name, value in zip(PARTITION_COLUMNS, key)
+        ),
+    )
+    os.makedirs(directory, exist_ok=True)
+    # Ordered tables write each partition once, to part-0, but a partition seen again
+    # gets another file instead of overwriting it
+    filename = f"part-{len(os.listdir(directory))}.parquet"
+    return pq.ParquetWriter(
+        os.path.join(directory, filename), DATASET_FILE_SCHEMA, compression="zstd"
+    )
 
 
 def export_tweets_by_users_threads(
@@ -61,24 +223,31 @@ def export_sp_fed_deps(min_length=None, format="csv"):
 
 
 def tweet_to_json(tweet):
-    """Converts a snscrape.Tweet object to a JSON string"""
-    tweet_dict = deepcopy(tweet.__dict__)
-
-    if tweet_dict.get("quotedTweet"):
-        tweet_dict["quotedTweet"] = tweet_to_json(tweet_dict["quotedTweet"])
-
-    if tweet_dict.get("retweetedTweet"):
-        tweet_dict["retweetedTweet"] = tweet_to_json(tweet_dict["retweetedTweet"])
+    """Converts a snscrape.Tweet object to a JSON compatible dict.
 
-    if tweet_dict.get("user"):
-        user_dict = tweet_dict["user"].__dict__
-        for key, value in user_dict.items():
-            user_dict[key] = str(value)
+    The dataclass is walked only once and never copied: numbers and booleans are kept,
+    datetimes become ISO strings and nested objects (user, quoted and retweeted tweets,
+    media, etc.) become nested dicts.
+    """
+    return _to_json(tweet)
 
-    for key, value in tweet_dict.items():
-        tweet_dict[key] = str(value)
 
-    return json.dumps(tweet_dict)
+def _to_json(value):
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return _to_json(value.value)
+    if is_dataclass(value):
+        return {
+            field.name: _to_json(getattr(value, field.name)) for field in fields(value)
+        }
+    if isinstance(value, dict):
+        return {str(_to_json(k)): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_to_json(v) for v in value]
+    return str(value)
 
 
 def clear_unwanted_rt_requests():
@@ -1,7 +1,9 @@
+from django.http import HttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 from django.views import generic
 
+from . import metrics
 from .models import Tweet
 
 
@@ -16,3 +18,9 @@ class IndexView(generic.ListView):
 class DetailView(generic.DetailView):
     template_name = "tweets/detail.html"
     model = Tweet
+
+
+def metrics_view(request):
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "tweets.querycount.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -166,6 +167,47 @@ FLOWER_PORT = env("FLOWER_PORT")
 # Scraping Settings
 MAX_SCRAPINGS = 1
 AUTO_START_SCRAPING = False
+SCRAPING_BATCH_SIZE = 500
+# Tweets fetched ahead of the database writes. 0 fetches and writes strictly in turn
+SCRAPING_PREFETCH_SIZE = 1000
+# Tweets in a row up to the high-water mark that end an incremental profile scraping.
+# More than the pinned tweets, which are older than the mark but come first
+INCREMENTAL_KNOWN_TWEETS = 5
+# Requests per second to Twitter, shared by all the scraping workers. 0 disables the limit
+SCRAPING_RATE_LIMIT = 1
+# Requests that can be made in a row once the limit has been idle
+SCRAPING_RATE_BURST = 5
+# Seconds for the shared rate to recover completely after being lowered by blocked requests
+SCRAPING_RATE_RECOVERY_SECONDS = 600
+# Attempts of a blocked request before the scraping fails, each one waiting for the shared rate
+SCRAPING_RETRIES = 10
+# "record" saves the items scraped by the tasks to cassettes, "replay" scrapes them from
+# the cassettes instead of Twitter. See tweets.cassettes
+SCRAPER_CASSETTE_MODE = None
+SCRAPER_CASSETTE_PATH = f"{BASE_DIR}/cassettes/"
+# Replay speed relative to the recorded scraping. 0 replays without waiting
+SCRAPER_REPLAY_SPEED = 1
+# Priority of conversation scrapings, below the default 0 of profile scrapings so that
+# the profiles of all users are scraped before their replies
+CONVERSATION_SCRAPING_PRIORITY = -10
+# Hours a request waits to gain one priority point. 0 disables aging
+SCRAPING_PRIORITY_AGING_HOURS = 24
+# Minutes without a heartbeat, sent after every written batch and while fetching tweets,
+# after which a started request is considered lost and put back in the queue. 0 disables
+# the expiration
+SCRAPING_LEASE_MINUTES = 60
+# Minimum seconds between the heartbeats sent while fetching tweets
+SCRAPING_HEARTBEAT_SECONDS = 60
+# Scrapes the conversations of a profile scraping in parallel, instead of one by one through start_next_scraping_request
+CONVERSATION_FANOUT = False
+# Conversation scrapings of a profile running at the same time when CONVERSATION_FANOUT is enabled
+CONVERSATION_FANOUT_CONCURRENCY = 4
+
+# Query count
+# Requests and tasks running more queries than this are logged. See tweets.querycount
+QUERY_COUNT_THRESHOLD = 100
+# Queries repeated this many times by a request or task are logged as likely N+1 queries
+N_PLUS_ONE_THRESHOLD = 10
 
 
 # Needed for Django Debug Toolbar